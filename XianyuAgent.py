@@ -1,8 +1,56 @@
 import re
-from typing import List, Dict
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Tuple, Optional
 import os
 from openai import OpenAI
 from loguru import logger
+from utils.aho_corasick import AhoCorasick
+from utils.llm_stream import ReplyStreamer
+from intent_classifier import IntentSampleLog, load_local_classifier
+from intent_cache import IntentCache
+
+
+# 默认意图规则，按优先级排列（技术类优先）；可通过INTENT_RULES_PATH指定的JSON文件覆盖
+DEFAULT_INTENT_RULES = {
+    'tech': {
+        'keywords': ['参数', '规格', '型号', '连接', '对比'],
+        'patterns': [r'和.+比'],
+    },
+    'price': {
+        'keywords': ['便宜', '价', '砍价', '少点'],
+        'patterns': [r'\d+元', r'能少\d+'],
+    },
+}
+
+
+def load_intent_rules(path: Optional[str]) -> Dict[str, Dict[str, List[str]]]:
+    """
+    加载意图规则文件
+    
+    文件为JSON对象，键为意图名，按书写顺序确定优先级，值包含keywords和patterns两个列表。
+    文件不存在或格式错误时使用默认规则。
+    """
+    if not path or not os.path.exists(path):
+        return DEFAULT_INTENT_RULES
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            rules = json.load(f)
+        for intent, rule in rules.items():
+            re.compile('|'.join(rule.get('patterns', [])))  # 提前校验正则
+            if not isinstance(rule.get('keywords', []), list):
+                raise ValueError(f"意图 {intent} 的keywords必须是列表")
+        logger.info(f"已加载意图规则: {path}，" + "，".join(
+            f"{intent} {len(rule.get('keywords', []))}个关键词/{len(rule.get('patterns', []))}个正则"
+            for intent, rule in rules.items()
+        ))
+        return rules
+    except Exception as e:
+        logger.error(f"加载意图规则失败，使用默认规则: {e}")
+        return DEFAULT_INTENT_RULES
 
 
 class XianyuReplyBot:
@@ -12,19 +60,44 @@ class XianyuReplyBot:
             api_key=os.getenv("API_KEY"),
             base_url=os.getenv("MODEL_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1"),
         )
+        # 流式生成：边接收边做安全过滤，可按句先发出已完成的句子
+        self.llm_stream = os.getenv("LLM_STREAM", "false").lower() == "true"  # 是否流式获取回复
+        self.stream_split = self.llm_stream and os.getenv("LLM_STREAM_SPLIT", "false").lower() == "true"  # 是否按句发送
+        self.streamer = ReplyStreamer(int(os.getenv("LLM_STREAM_MIN_CHARS", "8"))) if self.llm_stream else None  # 按句发送时单条消息最小长度
         self._init_system_prompts()
         self._init_agents()
-        self.router = IntentRouter(self.agents['classify'])
+        self.intent_rules_path = os.getenv("INTENT_RULES_PATH", "prompts/intent_rules.json")
+        self.intent_model_path = os.getenv("INTENT_MODEL_PATH", "data/intent_model.json")  # 本地意图模型，不存在时全部走大模型分类
+        self.intent_model_threshold = float(os.getenv("INTENT_MODEL_THRESHOLD", "0.85"))  # 本地模型置信度达到该值才采用
+        self.intent_sample_log = IntentSampleLog(os.getenv("INTENT_SAMPLE_LOG", "data/intent_samples.jsonl"))  # 大模型分类结果记录，用于训练本地模型
+        self.intent_cache = IntentCache(
+            os.getenv("INTENT_CACHE_PATH", "data/intent_cache.json"),  # 大模型分类结果缓存文件
+            max_size=int(os.getenv("INTENT_CACHE_SIZE", "5000")),  # 缓存条数上限
+            ttl=int(os.getenv("INTENT_CACHE_TTL", "604800")),  # 分类结果有效期（秒）
+        )
+        self.router = self._build_router()
         self.last_intent = None  # 记录最后一次意图
 
+        # LLM调用线程池，异步回复流程在此执行阻塞的OpenAI请求，避免阻塞事件循环
+        self.llm_workers = int(os.getenv("LLM_WORKERS", "4"))
+        self.executor = ThreadPoolExecutor(max_workers=self.llm_workers, thread_name_prefix="llm")
+
+        # 投机回复：需要大模型分类时，分类与猜测意图的回复并行生成，猜中时省去一次串行的大模型延迟
+        self.speculative_reply = os.getenv("SPECULATIVE_REPLY", "false").lower() == "true"  # 是否启用投机回复
+        self.speculative_intent = os.getenv("SPECULATIVE_INTENT", "default")  # 本地模型没有预测时猜测的意图
+        # 投机分支使用独立线程池，避免与等待它的回复线程争用同一个池而死锁
+        self.speculative_executor = ThreadPoolExecutor(max_workers=self.llm_workers, thread_name_prefix="llm-spec")
+        self._speculation_lock = threading.Lock()
+        self.speculation_stats = {"speculations": 0, "hits": 0, "misses": 0, "saved_seconds": 0.0}
+
 
     def _init_agents(self):
         """初始化各领域Agent"""
         self.agents = {
-            'classify':ClassifyAgent(self.client, self.classify_prompt, self._safe_filter),
-            'price': PriceAgent(self.client, self.price_prompt, self._safe_filter),
-            'tech': TechAgent(self.client, self.tech_prompt, self._safe_filter),
-            'default': DefaultAgent(self.client, self.default_prompt, self._safe_filter),
+            'classify':ClassifyAgent(self.client, self.classify_prompt, self._safe_filter),  # 分类结果需要完整标签，不走流式
+            'price': PriceAgent(self.client, self.price_prompt, self._safe_filter, self.streamer),
+            'tech': TechAgent(self.client, self.tech_prompt, self._safe_filter, self.streamer),
+            'default': DefaultAgent(self.client, self.default_prompt, self._safe_filter, self.streamer),
         }
 
     def _init_system_prompts(self):
@@ -70,41 +143,127 @@ class XianyuReplyBot:
 
     def generate_reply(self, user_msg: str, item_desc: str, context: List[Dict]) -> str:
         """生成回复主流程"""
+        reply, intent = self._generate(user_msg, item_desc, context)
+        self.last_intent = intent  # 保存当前意图
+        return reply
+
+    async def agenerate_reply(self, user_msg: str, item_desc: str, context: List[Dict],
+                              on_sentence: Optional[Callable[[str], None]] = None) -> Tuple[str, str]:
+        """
+        异步生成回复，在线程池中执行阻塞的大模型调用
+
+        并发场景下last_intent会被其他会话覆盖，因此直接返回本次回复对应的意图。
+        启用按句发送时，每完成一句在线程池中调用on_sentence；投机命中的回复已完整生成，不会回调。
+
+        Returns:
+            Tuple[str, str]: (回复内容, 意图)
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._generate, user_msg, item_desc, context, on_sentence)
+
+    def _generate(self, user_msg: str, item_desc: str, context: List[Dict],
+                  on_sentence: Optional[Callable[[str], None]] = None) -> Tuple[str, str]:
+        """路由意图并调用对应Agent，返回(回复内容, 意图)"""
         # 记录用户消息
         # logger.debug(f'用户所发消息: {user_msg}')
         
         formatted_context = self.format_history(context)
         # logger.debug(f'对话历史: {formatted_context}')
         
-        # 1. 路由决策
-        detected_intent = self.router.detect(user_msg, item_desc, formatted_context)
+        # 1. 路由决策（规则、缓存、本地模型）
+        detected_intent, guess = self.router.resolve(user_msg)
+
+        # 2. 获取议价次数
+        bargain_count = self._extract_bargain_count(context)
 
+        if detected_intent is None and self.speculative_reply:
+            return self._generate_speculative(user_msg, item_desc, formatted_context, bargain_count, guess, on_sentence)
+        if detected_intent is None:
+            detected_intent = self.router.classify(user_msg, item_desc, formatted_context)
 
+        # 3. 获取对应Agent
+        agent, intent = self._select_agent(detected_intent)
+        logger.info(f'意图识别完成: {intent}')
+        logger.info(f'议价次数: {bargain_count}')
 
-        # 2. 获取对应Agent
+        # 4. 生成回复
+        reply = agent.generate(
+            user_msg=user_msg,
+            item_desc=item_desc,
+            context=formatted_context,
+            bargain_count=bargain_count,
+            on_sentence=on_sentence
+        )
+        return reply, intent
 
+    def _select_agent(self, detected_intent: Optional[str]) -> Tuple["BaseAgent", str]:
+        """根据意图选择Agent，未知意图和内部Agent使用默认Agent"""
         internal_intents = {'classify'}  # 定义不对外开放的Agent
 
         if detected_intent in self.agents and detected_intent not in internal_intents:
-            agent = self.agents[detected_intent]
-            logger.info(f'意图识别完成: {detected_intent}')
-            self.last_intent = detected_intent  # 保存当前意图
-        else:
-            agent = self.agents['default']
-            logger.info(f'意图识别完成: default')
-            self.last_intent = 'default'  # 保存当前意图
+            return self.agents[detected_intent], detected_intent
+        return self.agents['default'], 'default'
+
+    def _generate_speculative(self, user_msg: str, item_desc: str, context: str, bargain_count: int,
+                              guess: Optional[str], on_sentence: Optional[Callable[[str], None]] = None) -> Tuple[str, str]:
+        """
+        投机生成回复
         
-        # 3. 获取议价次数
-        bargain_count = self._extract_bargain_count(context)
-        logger.info(f'议价次数: {bargain_count}')
+        大模型分类的同时，用猜测的意图（本地模型的低置信度预测，没有时为SPECULATIVE_INTENT）对应的Agent生成回复。
+        分类结果与猜测一致时直接使用该回复；不一致时丢弃投机结果（尚未开始的请求会被取消），按分类结果重新生成。
+        投机分支可能被丢弃，因此不按句回调；只有重新生成的回复才会回调on_sentence。
+        """
+        guess_agent, guess_intent = self._select_agent(guess or self.speculative_intent)
+        start = time.perf_counter()
+        future = self.speculative_executor.submit(
+            self._timed_generate, guess_agent, user_msg, item_desc, context, bargain_count
+        )
+        detected_intent = self.router.classify(user_msg, item_desc, context)
+        classify_seconds = time.perf_counter() - start
 
-        # 4. 生成回复
-        return agent.generate(
+        agent, intent = self._select_agent(detected_intent)
+        logger.info(f'意图识别完成: {intent}')
+        logger.info(f'议价次数: {bargain_count}')
+        if intent == guess_intent:
+            reply, reply_seconds = future.result()
+            # 串行耗时为分类+回复，并行后为两者同时进行的实际耗时
+            saved = classify_seconds + reply_seconds - (time.perf_counter() - start)
+            self._record_speculation(hit=True, saved=saved)
+            logger.debug(f'投机回复命中: {intent}，节省 {saved:.2f}s')
+            return reply, intent
+
+        future.cancel()
+        self._record_speculation(hit=False)
+        logger.debug(f'投机回复未命中: 猜测 {guess_intent}，实际 {intent}')
+        reply = agent.generate(
             user_msg=user_msg,
             item_desc=item_desc,
-            context=formatted_context,
-            bargain_count=bargain_count
+            context=context,
+            bargain_count=bargain_count,
+            on_sentence=on_sentence
         )
+        return reply, intent
+
+    @staticmethod
+    def _timed_generate(agent, user_msg, item_desc, context, bargain_count):
+        start = time.perf_counter()
+        reply = agent.generate(user_msg=user_msg, item_desc=item_desc, context=context, bargain_count=bargain_count)
+        return reply, time.perf_counter() - start
+
+    def _record_speculation(self, hit: bool, saved: float = 0.0):
+        with self._speculation_lock:
+            self.speculation_stats["speculations"] += 1
+            self.speculation_stats["hits" if hit else "misses"] += 1
+            self.speculation_stats["saved_seconds"] += max(saved, 0.0)
+
+    def get_speculation_stats(self):
+        """获取投机回复命中率与节省的延迟"""
+        with self._speculation_lock:
+            stats = dict(self.speculation_stats)
+        total, hits = stats["speculations"], stats["hits"]
+        stats["hit_rate"] = hits / total if total else 0.0
+        stats["avg_saved"] = stats["saved_seconds"] / hits if hits else 0.0
+        return stats
     
     def _extract_bargain_count(self, context: List[Dict]) -> int:
         """
@@ -128,80 +287,169 @@ class XianyuReplyBot:
                     pass
         return 0
 
+    def _build_router(self) -> "IntentRouter":
+        return IntentRouter(
+            self.agents['classify'],
+            load_intent_rules(self.intent_rules_path),
+            local_classifier=load_local_classifier(self.intent_model_path),
+            local_threshold=self.intent_model_threshold,
+            sample_log=self.intent_sample_log,
+            cache=self.intent_cache,
+        )
+
     def reload_prompts(self):
         """重新加载所有提示词"""
         logger.info("正在重新加载提示词...")
+        old_classify_prompt = self.classify_prompt
         self._init_system_prompts()
+        if self.classify_prompt != old_classify_prompt:
+            logger.info("分类提示词已变化，清空意图缓存")
+            self.intent_cache.clear()
         self._init_agents()
+        # 路由器引用新的分类Agent，并重新加载意图规则和本地意图模型
+        self.router = self._build_router()
         logger.info("提示词重新加载完成")
 
 
 class IntentRouter:
-    """意图路由决策器"""
-
-    def __init__(self, classify_agent):
-        self.rules = {
-            'tech': {  # 技术类优先判定
-                'keywords': ['参数', '规格', '型号', '连接', '对比'],
-                'patterns': [
-                    r'和.+比'             
-                ]
-            },
-            'price': {
-                'keywords': ['便宜', '价', '砍价', '少点'],
-                'patterns': [r'\d+元', r'能少\d+']
-            }
+    """
+    意图路由决策器
+    
+    所有意图的关键词编译为一个Aho-Corasick自动机，每个意图的正则合并为一个预编译正则，
+    每条消息只扫描一遍即可得到各意图的命中；按规则优先级返回第一个命中的意图。
+    规则未命中时依次查询大模型分类结果缓存和本地意图模型，置信度不足或没有模型时再由大模型分类，
+    大模型的分类结果写入缓存并记录为训练样本。
+    """
+
+    def __init__(self, classify_agent, rules: Optional[Dict[str, Dict[str, List[str]]]] = None,
+                 local_classifier=None, local_threshold: float = 0.85, sample_log: Optional[IntentSampleLog] = None,
+                 cache: Optional[IntentCache] = None):
+        self.rules = rules or DEFAULT_INTENT_RULES
+        self.priority = list(self.rules)  # 规则书写顺序即优先级
+        self.automaton = AhoCorasick(
+            (kw, intent) for intent, rule in self.rules.items() for kw in rule.get('keywords', [])
+        )
+        self.patterns = {
+            intent: re.compile('|'.join(f'(?:{p})' for p in rule['patterns']))
+            for intent, rule in self.rules.items() if rule.get('patterns')
         }
+        self.clean_pattern = re.compile(r'[^\w\u4e00-\u9fa5]')
         self.classify_agent = classify_agent
+        self.local_classifier = local_classifier
+        self.local_threshold = local_threshold
+        self.sample_log = sample_log
+        self.cache = cache
+        self.stats = {"rule": 0, "cache": 0, "local": 0, "llm": 0}  # 各级路由的命中次数
+        self._lock = threading.Lock()
+
+    def match(self, user_msg: str) -> Tuple[Optional[str], List[Tuple[int, int, str]]]:
+        """
+        按规则匹配意图
+        
+        Returns:
+            Tuple: (意图, 命中片段列表[(起始, 结束, 文本)])，位置基于去除标点后的文本；未命中时意图为None
+        """
+        text_clean = self.clean_pattern.sub('', user_msg)
+        
+        # 1. 一次扫描得到所有意图的关键词命中
+        hits = {}
+        for start, end, keyword, intent in self.automaton.iter(text_clean):
+            hits.setdefault(intent, []).append((start, end, keyword))
+        
+        # 2. 按优先级依次检查关键词与正则（技术类优先）
+        for intent in self.priority:
+            if intent in hits:
+                return intent, hits[intent]
+            pattern = self.patterns.get(intent)
+            if pattern:
+                m = pattern.search(text_clean)
+                if m:
+                    return intent, [(m.start(), m.end(), m.group())]
+        return None, []
 
     def detect(self, user_msg: str, item_desc, context) -> str:
         """三级路由策略（技术优先）"""
-        text_clean = re.sub(r'[^\w\u4e00-\u9fa5]', '', user_msg)
-        
-        # 1. 技术类关键词优先检查
-        if any(kw in text_clean for kw in self.rules['tech']['keywords']):
-            # logger.debug(f"技术类关键词匹配: {[kw for kw in self.rules['tech']['keywords'] if kw in text_clean]}")
-            return 'tech'
-            
-        # 2. 技术类正则优先检查
-        for pattern in self.rules['tech']['patterns']:
-            if re.search(pattern, text_clean):
-                # logger.debug(f"技术类正则匹配: {pattern}")
-                return 'tech'
-
-        # 3. 价格类检查
-        for intent in ['price']:
-            if any(kw in text_clean for kw in self.rules[intent]['keywords']):
-                # logger.debug(f"价格类关键词匹配: {[kw for kw in self.rules[intent]['keywords'] if kw in text_clean]}")
-                return intent
-            
-            for pattern in self.rules[intent]['patterns']:
-                if re.search(pattern, text_clean):
-                    # logger.debug(f"价格类正则匹配: {pattern}")
-                    return intent
+        intent, _ = self.resolve(user_msg)
+        if intent:
+            return intent
+        return self.classify(user_msg, item_desc, context)
+
+    def resolve(self, user_msg: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        不调用大模型确定意图：依次尝试规则、分类结果缓存和本地模型
         
-        # 4. 大模型兜底
+        Returns:
+            Tuple: (意图, 猜测)，无法确定时意图为None，猜测为本地模型置信度不足的预测（没有时为None）
+        """
+        intent, spans = self.match(user_msg)
+        if intent:
+            # logger.debug(f"规则匹配意图 {intent}: {spans}")
+            self._record("rule")
+            return intent, None
+
+        # 大模型分类结果缓存
+        if self.cache is not None:
+            intent = self.cache.get(user_msg)
+            if intent:
+                self._record("cache")
+                return intent, None
+
+        # 本地模型
+        guess = None
+        if self.local_classifier is not None:
+            guess, confidence = self.local_classifier.predict(user_msg)
+            if guess and confidence >= self.local_threshold:
+                logger.debug(f"本地模型识别意图 {guess}，置信度 {confidence:.2f}")
+                self._record("local")
+                return guess, None
+        return None, guess
+
+    def classify(self, user_msg: str, item_desc, context) -> str:
+        """大模型兜底分类，结果写入缓存并记录为训练样本"""
         # logger.debug("使用大模型进行意图分类")
-        return self.classify_agent.generate(
+        self._record("llm")
+        intent = self.classify_agent.generate(
             user_msg=user_msg,
             item_desc=item_desc,
             context=context
         )
+        if intent:
+            # 缓存与本地模型返回的都是去除空白后的标签，大模型结果保持一致
+            intent = intent.strip()
+            if self.cache is not None:
+                self.cache.put(user_msg, intent)
+            if self.sample_log is not None:
+                self.sample_log.append(user_msg, intent)
+        return intent
+
+    def _record(self, level: str):
+        with self._lock:
+            self.stats[level] += 1
+
+    def get_stats(self):
+        """获取各级路由命中次数及大模型分类占比"""
+        with self._lock:
+            stats = dict(self.stats)
+        total = sum(stats.values())
+        return {**stats, "llm_ratio": stats["llm"] / total if total else 0.0}
 
 
 class BaseAgent:
     """Agent基类"""
 
-    def __init__(self, client, system_prompt, safety_filter):
+    temperature = 0.4
+
+    def __init__(self, client, system_prompt, safety_filter, streamer: Optional[ReplyStreamer] = None):
         self.client = client
         self.system_prompt = system_prompt
         self.safety_filter = safety_filter
+        self.streamer = streamer  # 为None时一次性获取完整回复
 
-    def generate(self, user_msg: str, item_desc: str, context: str, bargain_count: int = 0) -> str:
+    def generate(self, user_msg: str, item_desc: str, context: str, bargain_count: int = 0,
+                 on_sentence: Optional[Callable[[str], None]] = None) -> str:
         """生成回复模板方法"""
         messages = self._build_messages(user_msg, item_desc, context)
-        response = self._call_llm(messages)
-        return self.safety_filter(response)
+        return self._complete(messages, self.temperature, on_sentence)
 
     def _build_messages(self, user_msg: str, item_desc: str, context: str) -> List[Dict]:
         """构建消息链"""
@@ -210,35 +458,40 @@ class BaseAgent:
             {"role": "user", "content": user_msg}
         ]
 
-    def _call_llm(self, messages: List[Dict], temperature: float = 0.4) -> str:
-        """调用大模型"""
-        response = self.client.chat.completions.create(
+    def _complete(self, messages: List[Dict], temperature: float,
+                  on_sentence: Optional[Callable[[str], None]] = None, **extra) -> str:
+        """调用大模型并做安全过滤；启用流式时边接收边过滤，可按句回调"""
+        if self.streamer is None:
+            return self.safety_filter(self._call_llm(messages, temperature, **extra))
+        return self.streamer.run(self.client, self._request(messages, temperature, **extra), self.safety_filter, on_sentence)
+
+    def _request(self, messages: List[Dict], temperature: float, **extra) -> Dict:
+        """构建大模型请求参数"""
+        return dict(
             model=os.getenv("MODEL_NAME", "qwen-max"),
             messages=messages,
             temperature=temperature,
             max_tokens=500,
-            top_p=0.8
+            top_p=0.8,
+            **extra
         )
+
+    def _call_llm(self, messages: List[Dict], temperature: float = 0.4, **extra) -> str:
+        """调用大模型"""
+        response = self.client.chat.completions.create(**self._request(messages, temperature, **extra))
         return response.choices[0].message.content
 
 
 class PriceAgent(BaseAgent):
     """议价处理Agent"""
 
-    def generate(self, user_msg: str, item_desc: str, context: str, bargain_count: int=0) -> str:
+    def generate(self, user_msg: str, item_desc: str, context: str, bargain_count: int=0,
+                 on_sentence: Optional[Callable[[str], None]] = None) -> str:
         """重写生成逻辑"""
         dynamic_temp = self._calc_temperature(bargain_count)
         messages = self._build_messages(user_msg, item_desc, context)
         messages[0]['content'] += f"\n▲当前议价轮次：{bargain_count}"
-
-        response = self.client.chat.completions.create(
-            model=os.getenv("MODEL_NAME", "qwen-max"),
-            messages=messages,
-            temperature=dynamic_temp,
-            max_tokens=500,
-            top_p=0.8
-        )
-        return self.safety_filter(response.choices[0].message.content)
+        return self._complete(messages, dynamic_temp, on_sentence)
 
     def _calc_temperature(self, bargain_count: int) -> float:
         """动态温度策略"""
@@ -247,23 +500,12 @@ class PriceAgent(BaseAgent):
 
 class TechAgent(BaseAgent):
     """技术咨询Agent"""
-    def generate(self, user_msg: str, item_desc: str, context: str, bargain_count: int=0) -> str:
+    def generate(self, user_msg: str, item_desc: str, context: str, bargain_count: int=0,
+                 on_sentence: Optional[Callable[[str], None]] = None) -> str:
         """重写生成逻辑"""
         messages = self._build_messages(user_msg, item_desc, context)
         # messages[0]['content'] += "\n▲知识库：\n" + self._fetch_tech_specs()
-
-        response = self.client.chat.completions.create(
-            model=os.getenv("MODEL_NAME", "qwen-max"),
-            messages=messages,
-            temperature=0.4,
-            max_tokens=500,
-            top_p=0.8,
-            extra_body={
-                "enable_search": True,
-            }
-        )
-
-        return self.safety_filter(response.choices[0].message.content)
+        return self._complete(messages, 0.4, on_sentence, extra_body={"enable_search": True})
 
 
     # def _fetch_tech_specs(self) -> str:
@@ -282,7 +524,4 @@ class ClassifyAgent(BaseAgent):
 class DefaultAgent(BaseAgent):
     """默认处理Agent"""
 
-    def _call_llm(self, messages: List[Dict], *args) -> str:
-        """限制默认回复长度"""
-        response = super()._call_llm(messages, temperature=0.7)
-        return response
\ No newline at end of file
+    temperature = 0.7
\ No newline at end of file
@@ -2,31 +2,57 @@ import time
 import os
 import re
 import sys
+import asyncio
 
 import requests
 from loguru import logger
 from utils.xianyu_utils import generate_sign
+from utils.retry import (
+    Retrier, RetryPolicy, RetryError, RetryableError, TokenRefreshedError, FatalError,
+    classify_ret, RET_SUCCESS, RET_FATAL, TOKEN_REFRESH_RET_CODES,
+)
+
+try:
+    import httpx
+except ImportError:  # 未安装httpx时AsyncXianyuApis退化为在线程中用requests发送请求
+    httpx = None
+
+try:
+    import h2  # noqa: F401  httpx启用HTTP/2需要h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+# 浏览器请求头；异步客户端只使用这些请求头，不继承requests的Connection等默认头（HTTP/2禁止连接级头部）
+DEFAULT_HEADERS = {
+    'accept': 'application/json',
+    'accept-language': 'zh-CN,zh;q=0.9',
+    'cache-control': 'no-cache',
+    'origin': 'https://www.goofish.com',
+    'pragma': 'no-cache',
+    'priority': 'u=1, i',
+    'referer': 'https://www.goofish.com/',
+    'sec-ch-ua': '"Not(A:Brand";v="99", "Google Chrome";v="133", "Chromium";v="133"',
+    'sec-ch-ua-mobile': '?0',
+    'sec-ch-ua-platform': '"Windows"',
+    'sec-fetch-dest': 'empty',
+    'sec-fetch-mode': 'cors',
+    'sec-fetch-site': 'same-site',
+    'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36',
+}
 
 
 class XianyuApis:
     def __init__(self):
         self.url = 'https://h5api.m.goofish.com/h5/mtop.taobao.idlemessage.pc.login.token/1.0/'
         self.session = requests.Session()
-        self.session.headers.update({
-            'accept': 'application/json',
-            'accept-language': 'zh-CN,zh;q=0.9',
-            'cache-control': 'no-cache',
-            'origin': 'https://www.goofish.com',
-            'pragma': 'no-cache',
-            'priority': 'u=1, i',
-            'referer': 'https://www.goofish.com/',
-            'sec-ch-ua': '"Not(A:Brand";v="99", "Google Chrome";v="133", "Chromium";v="133"',
-            'sec-ch-ua-mobile': '?0',
-            'sec-ch-ua-platform': '"Windows"',
-            'sec-fetch-dest': 'empty',
-            'sec-fetch-mode': 'cors',
-            'sec-fetch-site': 'same-site',
-            'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36',
+        self.session.headers.update(DEFAULT_HEADERS)
+        # 各mtop接口共享的重试引擎：指数退避+抖动、按接口的重试预算、错误码分类与统计
+        self.retrier = Retrier({
+            'login': RetryPolicy(max_attempts=2, base_delay=0.5, max_delay=4, deadline=20),
+            'token': RetryPolicy(max_attempts=2, base_delay=0.5, max_delay=4, deadline=30),
+            'item': RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=4, deadline=20),
         })
         
     def clear_duplicate_cookies(self):
@@ -86,69 +112,46 @@ class XianyuApis:
         except Exception as e:
             logger.warning(f"更新.env文件失败: {str(e)}")
         
-    def hasLogin(self, retry_count=0):
-        """调用hasLogin.do接口进行登录状态检查"""
-        if retry_count >= 2:
-            logger.error("Login检查失败，重试次数过多")
-            return False
-            
-        try:
-            url = 'https://passport.goofish.com/newlogin/hasLogin.do'
-            params = {
-                'appName': 'xianyu',
-                'fromSite': '77'
-            }
-            data = {
-                'hid': self.session.cookies.get('unb', ''),
-                'ltl': 'true',
-                'appName': 'xianyu',
-                'appEntrance': 'web',
-                '_csrf_token': self.session.cookies.get('XSRF-TOKEN', ''),
-                'umidToken': '',
-                'hsiz': self.session.cookies.get('cookie2', ''),
-                'bizParams': 'taobaoBizLoginFrom=web',
-                'mainPage': 'false',
-                'isMobile': 'false',
-                'lang': 'zh_CN',
-                'returnUrl': '',
-                'fromSite': '77',
-                'isIframe': 'true',
-                'documentReferer': 'https://www.goofish.com/',
-                'defaultView': 'hasLogin',
-                'umidTag': 'SERVER',
-                'deviceId': self.session.cookies.get('cna', '')
-            }
-            
-            response = self.session.post(url, params=params, data=data)
-            res_json = response.json()
-            
-            if res_json.get('content', {}).get('success'):
-                logger.debug("Login成功")
-                # 清理和更新cookies
-                self.clear_duplicate_cookies()
-                return True
-            else:
-                logger.warning(f"Login失败: {res_json}")
-                time.sleep(0.5)
-                return self.hasLogin(retry_count + 1)
-                
-        except Exception as e:
-            logger.error(f"Login请求异常: {str(e)}")
-            time.sleep(0.5)
-            return self.hasLogin(retry_count + 1)
+    def _build_login_request(self):
+        """构造hasLogin.do请求的url、params和data"""
+        url = 'https://passport.goofish.com/newlogin/hasLogin.do'
+        params = {
+            'appName': 'xianyu',
+            'fromSite': '77'
+        }
+        data = {
+            'hid': self.session.cookies.get('unb', ''),
+            'ltl': 'true',
+            'appName': 'xianyu',
+            'appEntrance': 'web',
+            '_csrf_token': self.session.cookies.get('XSRF-TOKEN', ''),
+            'umidToken': '',
+            'hsiz': self.session.cookies.get('cookie2', ''),
+            'bizParams': 'taobaoBizLoginFrom=web',
+            'mainPage': 'false',
+            'isMobile': 'false',
+            'lang': 'zh_CN',
+            'returnUrl': '',
+            'fromSite': '77',
+            'isIframe': 'true',
+            'documentReferer': 'https://www.goofish.com/',
+            'defaultView': 'hasLogin',
+            'umidTag': 'SERVER',
+            'deviceId': self.session.cookies.get('cna', '')
+        }
+        return url, params, data
 
-    def get_token(self, device_id, retry_count=0):
-        if retry_count >= 2:  # 最多重试3次
-            logger.warning("获取token失败，尝试重新登陆")
-            # 尝试通过hasLogin重新登录
-            if self.hasLogin():
-                logger.info("重新登录成功，重新尝试获取token")
-                return self.get_token(device_id, 0)  # 重置重试次数
-            else:
-                logger.error("重新登录失败，Cookie已失效")
-                logger.error("🔴 程序即将退出，请更新.env文件中的COOKIES_STR后重新启动")
-                sys.exit(1)  # 直接退出程序
+    def _build_mtop_request(self, api, data_val):
+        """
+        构造mtop接口请求，使用当前cookie中的_m_h5_tk生成签名
+        
+        Args:
+            api: mtop接口名，如mtop.taobao.idle.pc.detail
+            data_val: 请求data的JSON字符串
             
+        Returns:
+            tuple: (url, params, data)
+        """
         params = {
             'jsv': '2.7.2',
             'appKey': '34839810',
@@ -159,11 +162,10 @@ class XianyuApis:
             'accountSite': 'xianyu',
             'dataType': 'json',
             'timeout': '20000',
-            'api': 'mtop.taobao.idlemessage.pc.login.token',
+            'api': api,
             'sessionOption': 'AutoLoginOnly',
             'spm_cnt': 'a21ybx.im.0.0',
         }
-        data_val = '{"appKey":"444e9908a51d1cb236a27862abc769c9","deviceId":"' + device_id + '"}'
         data = {
             'data': data_val,
         }
@@ -173,94 +175,217 @@ class XianyuApis:
         
         sign = generate_sign(params['t'], token, data_val)
         params['sign'] = sign
+        return f'https://h5api.m.goofish.com/h5/{api}/1.0/', params, data
+
+    def _check_mtop_response(self, response, name):
+        """
+        检查mtop接口返回，成功时返回JSON结果
+        
+        Raises:
+            TokenRefreshedError: 签名令牌过期且响应带有新cookie，更新cookie后重试
+            RetryableError: 令牌过期、限流等可重试错误（有Set-Cookie时先更新cookie）
+            FatalError: 风控、参数等不可重试错误
+        """
+        res_json = response.json()
+        if not isinstance(res_json, dict):
+            logger.error(f"{name}返回格式异常: {res_json}")
+            raise RetryableError(f"{name}返回格式异常")
+            
+        ret_value = res_json.get('ret', [])
+        kind, code = classify_ret(ret_value)
+        if kind == RET_SUCCESS:
+            return res_json
+            
+        logger.warning(f"{name}调用失败，错误信息: {ret_value}")
+        # 处理响应中的Set-Cookie
+        if 'Set-Cookie' in response.headers:
+            logger.debug("检测到Set-Cookie，更新cookie")
+            self.clear_duplicate_cookies()
+            if code.startswith(TOKEN_REFRESH_RET_CODES):
+                raise TokenRefreshedError(code)
+        if kind == RET_FATAL:
+            raise FatalError(code)
+        raise RetryableError(code)
+        
+    def _check_login_response(self, response):
+        """检查hasLogin.do返回，登录成功时清理cookie，失败时抛出RetryableError"""
+        res_json = response.json()
+        if res_json.get('content', {}).get('success'):
+            logger.debug("Login成功")
+            # 清理和更新cookies
+            self.clear_duplicate_cookies()
+            return True
+        logger.warning(f"Login失败: {res_json}")
+        raise RetryableError("Login失败")
         
+    def _exit_cookie_expired(self):
+        logger.error("重新登录失败，Cookie已失效")
+        logger.error("🔴 程序即将退出，请更新.env文件中的COOKIES_STR后重新启动")
+        sys.exit(1)  # 直接退出程序
+
+    def hasLogin(self):
+        """调用hasLogin.do接口进行登录状态检查"""
+        def attempt():
+            url, params, data = self._build_login_request()
+            return self._check_login_response(self.session.post(url, params=params, data=data))
+            
         try:
-            response = self.session.post('https://h5api.m.goofish.com/h5/mtop.taobao.idlemessage.pc.login.token/1.0/', params=params, data=data)
-            res_json = response.json()
+            return self.retrier.call('login', attempt)
+        except RetryError as e:
+            logger.error(f"Login检查失败: {e}")
+            return False
+
+    def get_token(self, device_id):
+        """获取token，失败时尝试通过hasLogin重新登录一次，仍失败则退出程序"""
+        data_val = '{"appKey":"444e9908a51d1cb236a27862abc769c9","deviceId":"' + device_id + '"}'
+        
+        def attempt():
+            url, params, data = self._build_mtop_request('mtop.taobao.idlemessage.pc.login.token', data_val)
+            return self._check_mtop_response(self.session.post(url, params=params, data=data), "Token API")
             
-            if isinstance(res_json, dict):
-                ret_value = res_json.get('ret', [])
-                # 检查ret是否包含成功信息
-                if not any('SUCCESS::调用成功' in ret for ret in ret_value):
-                    logger.warning(f"Token API调用失败，错误信息: {ret_value}")
-                    # 处理响应中的Set-Cookie
-                    if 'Set-Cookie' in response.headers:
-                        logger.debug("检测到Set-Cookie，更新cookie")  # 降级为DEBUG并简化
-                        self.clear_duplicate_cookies()
-                    time.sleep(0.5)
-                    return self.get_token(device_id, retry_count + 1)
-                else:
-                    logger.info("Token获取成功")
-                    return res_json
-            else:
-                logger.error(f"Token API返回格式异常: {res_json}")
-                return self.get_token(device_id, retry_count + 1)
-                
-        except Exception as e:
-            logger.error(f"Token API请求异常: {str(e)}")
-            time.sleep(0.5)
-            return self.get_token(device_id, retry_count + 1)
+        for relogged in (False, True):
+            try:
+                res_json = self.retrier.call('token', attempt)
+                logger.info("Token获取成功")
+                return res_json
+            except RetryError as e:
+                logger.warning(f"获取token失败: {e}")
+            if relogged:
+                break
+            logger.warning("获取token失败，尝试重新登陆")
+            if not self.hasLogin():
+                break
+            logger.info("重新登录成功，重新尝试获取token")
+        self._exit_cookie_expired()
 
-    def get_item_info(self, item_id, retry_count=0):
+    def get_item_info(self, item_id):
         """获取商品信息，自动处理token失效的情况"""
-        if retry_count >= 3:  # 最多重试3次
-            logger.error("获取商品信息失败，重试次数过多")
-            return {"error": "获取商品信息失败，重试次数过多"}
+        data_val = '{"itemId":"' + item_id + '"}'
+        
+        def attempt():
+            url, params, data = self._build_mtop_request('mtop.taobao.idle.pc.detail', data_val)
+            return self._check_mtop_response(self.session.post(url, params=params, data=data), "商品信息API")
             
-        params = {
-            'jsv': '2.7.2',
-            'appKey': '34839810',
-            't': str(int(time.time()) * 1000),
-            'sign': '',
-            'v': '1.0',
-            'type': 'originaljson',
-            'accountSite': 'xianyu',
-            'dataType': 'json',
-            'timeout': '20000',
-            'api': 'mtop.taobao.idle.pc.detail',
-            'sessionOption': 'AutoLoginOnly',
-            'spm_cnt': 'a21ybx.im.0.0',
-        }
+        try:
+            res_json = self.retrier.call('item', attempt)
+            logger.debug(f"商品信息获取成功: {item_id}")
+            return res_json
+        except RetryError as e:
+            logger.error(f"获取商品信息失败: {e}")
+            return {"error": f"获取商品信息失败: {e}"}
+
+
+class AsyncXianyuApis(XianyuApis):
+    """
+    咸鱼API的异步版本
+    
+    使用httpx.AsyncClient（支持时启用HTTP/2）复用连接池，与同步版本共享同一个cookie jar，
+    签名、cookie清理与重试逻辑沿用XianyuApis。未安装httpx时退化为在线程中用requests.Session发送请求。
+    """
+    
+    def __init__(self, timeouts=None, max_connections=20, max_keepalive_connections=10, keepalive_expiry=60):
+        """
+        初始化异步API客户端
         
-        data_val = '{"itemId":"' + item_id + '"}'
-        data = {
-            'data': data_val,
-        }
+        Args:
+            timeouts: 各接口超时时间（秒），键为login/token/item
+            max_connections: 连接池最大连接数
+            max_keepalive_connections: 连接池最大空闲长连接数
+            keepalive_expiry: 空闲长连接保持时间（秒）
+        """
+        super().__init__()
+        self.timeouts = {'login': 10, 'token': 10, 'item': 8}
+        if timeouts:
+            self.timeouts.update(timeouts)
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self._client = None
         
-        # 简单获取token，信任cookies已清理干净
-        token = self.session.cookies.get('_m_h5_tk', '').split('_')[0]
+    @property
+    def client(self):
+        """延迟创建AsyncClient，保证在事件循环内创建"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                headers=DEFAULT_HEADERS,
+                cookies=self.session.cookies,  # 与requests.Session共享同一个cookie jar
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+            # httpx会补充Connection: keep-alive默认头，HTTP/2中该头部非法；HTTP/1.1默认即为长连接
+            self._client.headers.pop("connection", None)
+            logger.debug(f"已创建异步HTTP客户端 (HTTP/2: {HTTP2_AVAILABLE})")
+        return self._client
         
-        sign = generate_sign(params['t'], token, data_val)
-        params['sign'] = sign
+    def clear_duplicate_cookies(self):
+        """清理重复的cookies，并让异步客户端使用新的cookie jar"""
+        super().clear_duplicate_cookies()
+        if self._client is not None:
+            self._client.cookies = self.session.cookies
+            
+    async def _post(self, url, params, data, timeout):
+        """发送POST请求，未安装httpx时在线程中使用requests.Session发送"""
+        if httpx is None:
+            return await asyncio.to_thread(self.session.post, url, params=params, data=data, timeout=timeout)
+        return await self.client.post(url, params=params, data=data, timeout=timeout)
         
+    async def hasLogin(self):
+        """调用hasLogin.do接口进行登录状态检查"""
+        async def attempt():
+            url, params, data = self._build_login_request()
+            return self._check_login_response(await self._post(url, params, data, self.timeouts['login']))
+            
         try:
-            response = self.session.post(
-                'https://h5api.m.goofish.com/h5/mtop.taobao.idle.pc.detail/1.0/', 
-                params=params, 
-                data=data
-            )
+            return await self.retrier.acall('login', attempt)
+        except RetryError as e:
+            logger.error(f"Login检查失败: {e}")
+            return False
             
-            res_json = response.json()
-            # 检查返回状态
-            if isinstance(res_json, dict):
-                ret_value = res_json.get('ret', [])
-                # 检查ret是否包含成功信息
-                if not any('SUCCESS::调用成功' in ret for ret in ret_value):
-                    logger.warning(f"商品信息API调用失败，错误信息: {ret_value}")
-                    # 处理响应中的Set-Cookie
-                    if 'Set-Cookie' in response.headers:
-                        logger.debug("检测到Set-Cookie，更新cookie")
-                        self.clear_duplicate_cookies()
-                    time.sleep(0.5)
-                    return self.get_item_info(item_id, retry_count + 1)
-                else:
-                    logger.debug(f"商品信息获取成功: {item_id}")
-                    return res_json
-            else:
-                logger.error(f"商品信息API返回格式异常: {res_json}")
-                return self.get_item_info(item_id, retry_count + 1)
-                
-        except Exception as e:
-            logger.error(f"商品信息API请求异常: {str(e)}")
-            time.sleep(0.5)
-            return self.get_item_info(item_id, retry_count + 1)
+    async def get_token(self, device_id):
+        """获取token，失败时尝试通过hasLogin重新登录一次，仍失败则退出程序"""
+        data_val = '{"appKey":"444e9908a51d1cb236a27862abc769c9","deviceId":"' + device_id + '"}'
+        
+        async def attempt():
+            url, params, data = self._build_mtop_request('mtop.taobao.idlemessage.pc.login.token', data_val)
+            return self._check_mtop_response(await self._post(url, params, data, self.timeouts['token']), "Token API")
+            
+        for relogged in (False, True):
+            try:
+                res_json = await self.retrier.acall('token', attempt)
+                logger.info("Token获取成功")
+                return res_json
+            except RetryError as e:
+                logger.warning(f"获取token失败: {e}")
+            if relogged:
+                break
+            logger.warning("获取token失败，尝试重新登陆")
+            if not await self.hasLogin():
+                break
+            logger.info("重新登录成功，重新尝试获取token")
+        self._exit_cookie_expired()
+            
+    async def get_item_info(self, item_id):
+        """获取商品信息，自动处理token失效的情况"""
+        data_val = '{"itemId":"' + item_id + '"}'
+        
+        async def attempt():
+            url, params, data = self._build_mtop_request('mtop.taobao.idle.pc.detail', data_val)
+            return self._check_mtop_response(await self._post(url, params, data, self.timeouts['item']), "商品信息API")
+            
+        try:
+            res_json = await self.retrier.acall('item', attempt)
+            logger.debug(f"商品信息获取成功: {item_id}")
+            return res_json
+        except RetryError as e:
+            logger.error(f"获取商品信息失败: {e}")
+            return {"error": f"获取商品信息失败: {e}"}
+            
+    async def aclose(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
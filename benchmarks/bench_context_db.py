@@ -0,0 +1,124 @@
+"""
+ChatContextManager 数据库开销基准测试
+
+模拟一条买家消息在主流程中触发的数据库操作（写入用户消息、读取商品信息、
+读取上下文及议价次数、写入机器人回复），对比每次操作都新建连接的旧实现
+与当前实现的单条消息耗时。
+
+用法:
+    python benchmarks/bench_context_db.py [--messages 2000] [--chats 50]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from context_manager import ChatContextManager
+
+
+class LegacyContextManager(ChatContextManager):
+    """旧实现：每个操作都新建并关闭一个连接（保留默认PRAGMA）"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 建表使用了连接管理器，WAL模式会持久化到数据库文件，这里恢复为默认的回滚日志模式
+        self.db.close_all()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+
+    def _run(self, sql, params=(), fetch=None, commit=False):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute(sql, params)
+            result = cursor.fetchone() if fetch == 'one' else cursor.fetchall() if fetch == 'all' else None
+            if commit:
+                conn.commit()
+            return result
+        finally:
+            conn.close()
+
+    def get_item_info(self, item_id):
+        row = self._run("SELECT data FROM items WHERE item_id = ?", (item_id,), fetch='one')
+        return json.loads(row[0]) if row else None
+
+    def add_message_by_chat(self, chat_id, user_id, item_id, role, content):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO messages (user_id, item_id, role, content, timestamp, chat_id) VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, item_id, role, content, datetime.now().isoformat(), chat_id)
+            )
+            cursor.execute(
+                "SELECT id FROM messages WHERE chat_id = ? ORDER BY timestamp DESC LIMIT ?, 1",
+                (chat_id, self.max_history)
+            )
+            oldest_to_keep = cursor.fetchone()
+            if oldest_to_keep:
+                cursor.execute("DELETE FROM messages WHERE chat_id = ? AND id < ?", (chat_id, oldest_to_keep[0]))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_context_by_chat(self, chat_id):
+        rows = self._run(
+            "SELECT role, content FROM messages WHERE chat_id = ? ORDER BY timestamp ASC LIMIT ?",
+            (chat_id, self.max_history), fetch='all'
+        )
+        messages = [{"role": role, "content": content} for role, content in rows]
+        bargain_count = self.get_bargain_count_by_chat(chat_id)
+        if bargain_count > 0:
+            messages.append({"role": "system", "content": f"议价次数: {bargain_count}"})
+        return messages
+
+    def get_bargain_count_by_chat(self, chat_id):
+        row = self._run("SELECT count FROM chat_bargain_counts WHERE chat_id = ?", (chat_id,), fetch='one')
+        return row[0] if row else 0
+
+
+def simulate(manager, messages, chats):
+    """按主流程的调用顺序模拟处理messages条买家消息，返回单条消息平均耗时(ms)"""
+    manager.save_item_info("item0", {"desc": "测试商品", "soldPrice": 99})
+    start = time.perf_counter()
+    for i in range(messages):
+        chat_id = f"chat{i % chats}"
+        manager.add_message_by_chat(chat_id, "buyer", "item0", "user", f"这个多少钱能出 {i}")
+        manager.get_item_info("item0")
+        manager.get_context_by_chat(chat_id)
+        manager.add_message_by_chat(chat_id, "seller", "item0", "assistant", f"亲，最低{i % 100}元哦")
+    return (time.perf_counter() - start) * 1000 / messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChatContextManager 数据库开销基准测试")
+    parser.add_argument("--messages", type=int, default=2000, help="模拟的买家消息数")
+    parser.add_argument("--chats", type=int, default=50, help="会话数")
+    args = parser.parse_args()
+
+    logger.remove()
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = LegacyContextManager(db_path=os.path.join(tmp, "legacy.db"))
+        legacy_ms = simulate(legacy, args.messages, args.chats)
+
+        pooled = ChatContextManager(db_path=os.path.join(tmp, "pooled.db"))
+        pooled_ms = simulate(pooled, args.messages, args.chats)
+        pooled.close()
+        legacy.close()
+
+    print(f"模拟消息数: {args.messages}, 会话数: {args.chats}")
+    print(f"旧实现（每次新建连接）: {legacy_ms:.3f} ms/消息")
+    print(f"当前实现（长连接+WAL+写缓冲）: {pooled_ms:.3f} ms/消息")
+    print(f"加速比: {legacy_ms / pooled_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+对话历史查询与清理基准测试
+
+在包含大量消息的数据库上，对比旧实现（单列chat_id索引、按ISO时间戳排序取窗口、
+每次写入都执行一次清理扫描）与当前实现（(chat_id, id)复合索引倒序取最新窗口、
+均摊清理）的读取与写入耗时。
+
+用法:
+    python benchmarks/bench_history_query.py [--rows 2000000] [--chats 20000] [--ops 2000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from context_manager import ChatContextManager
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    chat_id TEXT
+);
+CREATE INDEX idx_user_item ON messages (user_id, item_id);
+CREATE INDEX idx_chat_id ON messages (chat_id);
+CREATE INDEX idx_timestamp ON messages (timestamp);
+CREATE TABLE chat_bargain_counts (
+    chat_id TEXT PRIMARY KEY,
+    count INTEGER DEFAULT 0,
+    last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+def build_db(path, rows, chats):
+    """生成包含rows条消息、分布在chats个会话中的旧结构数据库"""
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    base = datetime(2025, 1, 1)
+    batch = []
+    for i in range(rows):
+        chat = i % chats
+        role = "user" if i % 2 == 0 else "assistant"
+        ts = (base + timedelta(seconds=i)).isoformat()
+        batch.append((f"u{chat}", f"item{chat % 500}", role, f"消息内容 {i}", ts, f"chat{chat}"))
+        if len(batch) >= 100000:
+            conn.executemany(
+                "INSERT INTO messages (user_id, item_id, role, content, timestamp, chat_id) VALUES (?, ?, ?, ?, ?, ?)",
+                batch
+            )
+            batch = []
+    if batch:
+        conn.executemany(
+            "INSERT INTO messages (user_id, item_id, role, content, timestamp, chat_id) VALUES (?, ?, ?, ?, ?, ?)",
+            batch
+        )
+    conn.commit()
+    conn.close()
+
+
+def bench_legacy(path, chat_ids, max_history):
+    """旧实现的读取窗口与写入+清理耗时(ms/次)"""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+
+    start = time.perf_counter()
+    for chat_id in chat_ids:
+        cursor.execute(
+            "SELECT role, content FROM messages WHERE chat_id = ? ORDER BY timestamp ASC LIMIT ?",
+            (chat_id, max_history)
+        )
+        messages = [{"role": role, "content": content} for role, content in cursor.fetchall()]
+        cursor.execute("SELECT count FROM chat_bargain_counts WHERE chat_id = ?", (chat_id,))
+        cursor.fetchone()
+    read_ms = (time.perf_counter() - start) * 1000 / len(chat_ids)
+
+    start = time.perf_counter()
+    for chat_id in chat_ids:
+        cursor.execute(
+            "INSERT INTO messages (user_id, item_id, role, content, timestamp, chat_id) VALUES (?, ?, ?, ?, ?, ?)",
+            ("u", "item", "user", "新消息", datetime.now().isoformat(), chat_id)
+        )
+        cursor.execute(
+            "SELECT id FROM messages WHERE chat_id = ? ORDER BY timestamp DESC LIMIT ?, 1",
+            (chat_id, max_history)
+        )
+        oldest_to_keep = cursor.fetchone()
+        if oldest_to_keep:
+            cursor.execute("DELETE FROM messages WHERE chat_id = ? AND id < ?", (chat_id, oldest_to_keep[0]))
+        conn.commit()
+    write_ms = (time.perf_counter() - start) * 1000 / len(chat_ids)
+    conn.close()
+    return read_ms, write_ms
+
+
+def bench_current(path, chat_ids, max_history):
+    """当前实现的读取窗口与写入+均摊清理耗时(ms/次)，关闭写缓冲与会话缓存以只测量数据库路径"""
+    start = time.perf_counter()
+    manager = ChatContextManager(max_history=max_history, db_path=path, write_batch_rows=1, context_cache_size=0)
+    migrate_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for chat_id in chat_ids:
+        manager.get_context_by_chat(chat_id)
+    read_ms = (time.perf_counter() - start) * 1000 / len(chat_ids)
+
+    start = time.perf_counter()
+    for chat_id in chat_ids:
+        manager.add_message_by_chat(chat_id, "u", "item", "user", "新消息")
+    write_ms = (time.perf_counter() - start) * 1000 / len(chat_ids)
+    manager.close()
+    return read_ms, write_ms, migrate_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对话历史查询与清理基准测试")
+    parser.add_argument("--rows", type=int, default=2000000, help="数据库中的消息总数")
+    parser.add_argument("--chats", type=int, default=20000, help="会话数")
+    parser.add_argument("--ops", type=int, default=2000, help="读/写操作次数")
+    parser.add_argument("--max-history", type=int, default=100, help="每个会话保留的消息数")
+    args = parser.parse_args()
+
+    logger.remove()
+    rng = random.Random(42)
+    chat_ids = [f"chat{rng.randrange(args.chats)}" for _ in range(args.ops)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        current_path = os.path.join(tmp, "current.db")
+
+        start = time.perf_counter()
+        build_db(legacy_path, args.rows, args.chats)
+        print(f"生成 {args.rows} 条消息 / {args.chats} 个会话，耗时 {time.perf_counter() - start:.1f}s")
+        with open(legacy_path, "rb") as src, open(current_path, "wb") as dst:
+            dst.write(src.read())
+
+        legacy_read, legacy_write = bench_legacy(legacy_path, chat_ids, args.max_history)
+        current_read, current_write, migrate_s = bench_current(current_path, chat_ids, args.max_history)
+
+    print(f"索引迁移耗时: {migrate_s:.1f}s（仅首次启动）")
+    print(f"读取窗口  旧实现: {legacy_read:.3f} ms/次  当前实现: {current_read:.3f} ms/次  ({legacy_read / current_read:.1f}x)")
+    print(f"写入+清理 旧实现: {legacy_write:.3f} ms/次  当前实现: {current_write:.3f} ms/次  ({legacy_write / current_write:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
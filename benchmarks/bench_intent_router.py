@@ -0,0 +1,125 @@
+"""
+意图路由基准测试
+
+对比原IntentRouter（每条消息逐个关键词in判断、逐个未编译正则search）与当前自动机实现的
+单条消息耗时，并校验两者在语料上的路由结果一致。关键词表按--keywords扩充到指定规模。
+
+语料来源：
+    --corpus 指定买家消息文件（每行一条），未指定时生成常见买家消息样本。
+
+用法:
+    python benchmarks/bench_intent_router.py [--corpus messages.txt] [--keywords 5 100 500] [--count 5000]
+"""
+
+import argparse
+import copy
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from XianyuAgent import IntentRouter, DEFAULT_INTENT_RULES
+
+FALLBACK = "default"
+
+
+class StubClassifyAgent:
+    """代替大模型分类，只统计兜底次数"""
+
+    def generate(self, **kwargs):
+        return FALLBACK
+
+
+class LegacyIntentRouter:
+    """原实现"""
+
+    def __init__(self, classify_agent, rules):
+        self.rules = rules
+        self.classify_agent = classify_agent
+
+    def detect(self, user_msg: str, item_desc, context) -> str:
+        text_clean = re.sub(r'[^\w一-龥]', '', user_msg)
+        if any(kw in text_clean for kw in self.rules['tech']['keywords']):
+            return 'tech'
+        for pattern in self.rules['tech']['patterns']:
+            if re.search(pattern, text_clean):
+                return 'tech'
+        for intent in ['price']:
+            if any(kw in text_clean for kw in self.rules[intent]['keywords']):
+                return intent
+            for pattern in self.rules[intent]['patterns']:
+                if re.search(pattern, text_clean):
+                    return intent
+        return self.classify_agent.generate(user_msg=user_msg, item_desc=item_desc, context=context)
+
+
+def random_word(rng):
+    return "".join(chr(rng.randint(0x4e00, 0x9fa5)) for _ in range(rng.randint(2, 4)))
+
+
+def scaled_rules(per_intent, rng):
+    """在默认规则基础上补充随机关键词和正则，扩充到每个意图per_intent个关键词"""
+    rules = copy.deepcopy(DEFAULT_INTENT_RULES)
+    for rule in rules.values():
+        while len(rule['keywords']) < per_intent:
+            rule['keywords'].append(random_word(rng))
+        while len(rule['patterns']) < max(2, per_intent // 20):
+            rule['patterns'].append(random_word(rng) + r'\d+')
+    return rules
+
+
+def sample_corpus(count, rng):
+    templates = [
+        "在吗", "你好，还在吗？", "最低多少钱", "能便宜点吗", "300元出不出", "能少50吗，诚心要",
+        "这个和新款比怎么样", "型号是多少", "支持蓝牙连接吗", "包邮吗", "什么时候发货",
+        "成色怎么样，有没有划痕", "有发票吗", "可以小刀吗", "同城可以自提吗", "还有其他颜色吗",
+        "电池健康多少", "保修还有多久", "拍了，麻烦尽快发货", "好的谢谢",
+    ]
+    return [rng.choice(templates) + rng.choice(["", "？", "！", "~", " 亲"]) for _ in range(count)]
+
+
+def bench(router, corpus, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for msg in corpus:
+            router.detect(msg, "", "")
+        best = min(best, time.perf_counter() - start)
+    return best / len(corpus) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="意图路由基准测试")
+    parser.add_argument("--corpus", help="买家消息文件，每行一条")
+    parser.add_argument("--count", type=int, default=5000, help="未指定--corpus时生成的消息数")
+    parser.add_argument("--keywords", type=int, nargs="+", default=[5, 100, 500], help="每个意图的关键词规模")
+    parser.add_argument("--rounds", type=int, default=3, help="重复轮数，取最快一轮")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            corpus = [line.strip() for line in f if line.strip()]
+    else:
+        corpus = sample_corpus(args.count, rng)
+
+    print(f"语料: {len(corpus)} 条")
+    for per_intent in args.keywords:
+        rules = scaled_rules(per_intent, rng)
+        legacy = LegacyIntentRouter(StubClassifyAgent(), rules)
+        current = IntentRouter(StubClassifyAgent(), rules)
+        results = [current.detect(msg, "", "") for msg in corpus]
+        assert results == [legacy.detect(msg, "", "") for msg in corpus], "路由结果不一致"
+        fallback = results.count(FALLBACK)
+
+        legacy_us = bench(legacy, corpus, args.rounds)
+        current_us = bench(current, corpus, args.rounds)
+        print(f"每个意图 {per_intent:>4} 个关键词: 原实现 {legacy_us:.2f} us/条, 当前 {current_us:.2f} us/条 "
+              f"({legacy_us / current_us:.1f}x), 大模型兜底 {fallback / len(corpus):.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+MessagePack解码基准测试与差分校验
+
+先用随机结构、截断数据和随机字节对比MessagePackDecoder（参考实现）与utils.msgpack_decoder
+各后端的解码结果，结果不一致时退出码为1；再对比单条载荷的解码耗时。
+
+载荷来源：
+    --payloads 指定抓取的同步包data文件（每行一条base64字符串），
+    未指定时生成与线上聊天消息结构一致的样本。
+
+用法:
+    python benchmarks/bench_msgpack_decode.py [--payloads payloads.txt] [--count 2000] [--fuzz 20000]
+"""
+
+import argparse
+import base64
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import msgpack_decoder
+from utils.xianyu_utils import MessagePackDecoder
+
+
+def pack(obj) -> bytes:
+    """生成样本用的最小MessagePack编码器"""
+    if obj is None:
+        return b"\xc0"
+    if obj is True:
+        return b"\xc3"
+    if obj is False:
+        return b"\xc2"
+    if isinstance(obj, int):
+        if 0 <= obj <= 0x7f:
+            return bytes([obj])
+        if -32 <= obj < 0:
+            return struct.pack(">b", obj)
+        for fmt, code, lo, hi in ((">B", 0xcc, 0, 2 ** 8), (">H", 0xcd, 0, 2 ** 16), (">I", 0xce, 0, 2 ** 32),
+                                  (">Q", 0xcf, 0, 2 ** 64), (">b", 0xd0, -2 ** 7, 2 ** 7),
+                                  (">h", 0xd1, -2 ** 15, 2 ** 15), (">i", 0xd2, -2 ** 31, 2 ** 31),
+                                  (">q", 0xd3, -2 ** 63, 2 ** 63)):
+            if lo <= obj < hi:
+                return bytes([code]) + struct.pack(fmt, obj)
+        raise OverflowError(obj)
+    if isinstance(obj, float):
+        return b"\xcb" + struct.pack(">d", obj)
+    if isinstance(obj, str):
+        raw = obj.encode("utf-8")
+        n = len(raw)
+        if n < 32:
+            return bytes([0xa0 | n]) + raw
+        if n < 2 ** 8:
+            return b"\xd9" + struct.pack(">B", n) + raw
+        if n < 2 ** 16:
+            return b"\xda" + struct.pack(">H", n) + raw
+        return b"\xdb" + struct.pack(">I", n) + raw
+    if isinstance(obj, bytes):
+        n = len(obj)
+        if n < 2 ** 8:
+            return b"\xc4" + struct.pack(">B", n) + obj
+        if n < 2 ** 16:
+            return b"\xc5" + struct.pack(">H", n) + obj
+        return b"\xc6" + struct.pack(">I", n) + obj
+    if isinstance(obj, list):
+        n = len(obj)
+        head = bytes([0x90 | n]) if n < 16 else (b"\xdc" + struct.pack(">H", n) if n < 2 ** 16
+                                                 else b"\xdd" + struct.pack(">I", n))
+        return head + b"".join(pack(v) for v in obj)
+    if isinstance(obj, dict):
+        n = len(obj)
+        head = bytes([0x80 | n]) if n < 16 else (b"\xde" + struct.pack(">H", n) if n < 2 ** 16
+                                                 else b"\xdf" + struct.pack(">I", n))
+        return head + b"".join(pack(k) + pack(v) for k, v in obj.items())
+    raise TypeError(type(obj))
+
+
+def sample_message(i):
+    """与线上聊天消息结构一致的样本"""
+    now = 1718000000000 + i
+    text = random.choice(["在吗", "还在吗？最低多少钱", "能便宜点吗，诚心要", "这个支持验货吗，成色怎么样，有没有划痕",
+                          "包邮吗" * random.randint(1, 20)])
+    return {
+        "1": {
+            "1": {"1": f"{random.randint(10 ** 9, 10 ** 10)}@goofish"},
+            "2": f"{random.randint(10 ** 10, 10 ** 11)}@goofish",
+            "3": f"{now}.PNM",
+            "4": 0,
+            "5": now,
+            "6": {"1": 101, "3": {"4": 1, "5": text, "type": 1}},
+            "7": 0,
+            "10": {
+                "reminderContent": text,
+                "reminderTitle": "买家昵称",
+                "reminderUrl": f"fleamarket://message_chat?itemId={random.randint(10 ** 11, 10 ** 12)}&peerUserId=1&sid=2",
+                "senderUserId": str(random.randint(10 ** 9, 10 ** 10)),
+                "senderUserType": "0",
+                "bizTag": '{"sourceId":"S:1","taskName":"","materialId":"","taskId":""}',
+                "detailNotice": text,
+                "extJson": '{"quickReply":"1","messageId":"abc","tag":"u"}',
+            },
+            "20": [1, 2, 3],
+        },
+        "2": 1,
+        "3": {"needPush": "true", "redReminder": "", "sessionType": "1"},
+    }
+
+
+def random_value(depth=0):
+    """差分校验用的随机结构，覆盖所有支持的类型与长度分支"""
+    kind = random.randint(0, 9 if depth < 3 else 5)
+    if kind == 0:
+        return random.choice([None, True, False])
+    if kind == 1:
+        return random.choice([random.randint(-32, 127), random.randint(-2 ** 63, 2 ** 63 - 1),
+                              random.randint(0, 2 ** 64 - 1), random.randint(-2 ** 15, 2 ** 16)])
+    if kind == 2:
+        return random.uniform(-1e9, 1e9)
+    if kind in (3, 4):
+        return "".join(random.choice("ab中文😀") for _ in range(random.choice([0, 5, 31, 32, 90])))
+    if kind == 5:
+        return os.urandom(random.choice([0, 3, 255, 256, 70000] if random.random() < 0.02 else [0, 3, 255, 256]))
+    if kind in (6, 7):
+        return [random_value(depth + 1) for _ in range(random.choice([0, 2, 15, 16, 17]))]
+    return {random_value(4) if random.random() < 0.2 else str(i): random_value(depth + 1)
+            for i in range(random.choice([0, 2, 15, 16, 20]))}
+
+
+def fuzz_inputs(count):
+    for _ in range(count):
+        value = random_value()
+        try:
+            data = pack(value)
+        except TypeError:
+            continue
+        mode = random.random()
+        if mode < 0.6:
+            yield data
+        elif mode < 0.75:
+            yield data[:random.randint(0, len(data))]           # 截断
+        elif mode < 0.85:
+            yield data + os.urandom(random.randint(1, 8))       # 多余字节
+        elif mode < 0.9:
+            yield bytes([random.choice([0xc1, 0xd4, 0xd5, 0xc7, 0xd8])]) + os.urandom(8)  # 不支持的类型
+        else:
+            yield os.urandom(random.randint(1, 64))
+
+
+def backends():
+    result = {"python": msgpack_decoder.unpackb_python}
+    if msgpack_decoder.msgpack is not None:
+        result["msgpack"] = msgpack_decoder.unpackb_c
+    return result
+
+
+def decode_with(unpackb, data):
+    try:
+        return unpackb(data)
+    except Exception:
+        return base64.b64encode(data).decode("utf-8")
+
+
+def differential(count):
+    """返回不一致的样本数"""
+    mismatches = 0
+    checked = 0
+    for data in fuzz_inputs(count):
+        expected = repr(MessagePackDecoder(data).decode())
+        for name, unpackb in backends().items():
+            actual = repr(decode_with(unpackb, data))
+            if actual != expected:
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"[{name}] 结果不一致: {data[:40].hex()}...")
+        checked += 1
+    print(f"差分校验: {checked} 个样本，不一致 {mismatches} 个")
+    return mismatches
+
+
+def bench(fn, payloads, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for data in payloads:
+            fn(data)
+        best = min(best, time.perf_counter() - start)
+    return best / len(payloads) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MessagePack解码基准测试")
+    parser.add_argument("--payloads", help="抓取的同步包data文件，每行一条base64")
+    parser.add_argument("--count", type=int, default=2000, help="未指定--payloads时生成的样本数")
+    parser.add_argument("--fuzz", type=int, default=20000, help="差分校验样本数，0为跳过")
+    parser.add_argument("--rounds", type=int, default=5, help="重复轮数，取最快一轮")
+    args = parser.parse_args()
+
+    random.seed(0)
+    if args.fuzz and differential(args.fuzz):
+        sys.exit(1)
+
+    if args.payloads:
+        with open(args.payloads, "r", encoding="utf-8") as f:
+            payloads = [base64.b64decode(line.strip()) for line in f if line.strip()]
+    else:
+        payloads = [pack(sample_message(i)) for i in range(args.count)]
+    avg_size = sum(len(p) for p in payloads) / len(payloads)
+    print(f"载荷: {len(payloads)} 条，平均 {avg_size:.0f} 字节")
+
+    reference = bench(lambda data: MessagePackDecoder(data).decode(), payloads, args.rounds)
+    print(f"MessagePackDecoder: {reference:.1f} us/条")
+    for name, unpackb in backends().items():
+        elapsed = bench(unpackb, payloads, args.rounds)
+        print(f"{name:>18}: {elapsed:.1f} us/条 ({reference / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+WebSocket接收路径基准测试
+
+对比旧接收路径（主循环与handle_message各ACK一次，每次都构造字典再json.dumps）
+与当前接收路径（解析一次、按模板只ACK一次、可选orjson）的单帧耗时和上行ACK字节数。
+
+帧来源：
+    --frames 指定录制的原始帧文件（每行一条WebSocket文本帧），
+    未指定时生成与线上帧结构一致的样本（心跳响应、同步推送、发送回执）。
+
+用法:
+    python benchmarks/bench_receive_path.py [--frames frames.txt] [--count 20000] [--rounds 5]
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import fastjson
+from utils.xianyu_utils import build_ack
+
+UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+      "Chrome/133.0.0.0 Safari/537.36 DingTalk(2.1.5) OS(Windows/10) Browser(Chrome/133.0.0.0) "
+      "DingWeb/2.1.5 IMPaaS DingWeb/2.1.5")
+
+
+def sample_frames(count):
+    """生成样本帧：约60%同步推送（需ACK）、30%心跳响应、10%发送回执"""
+    frames = []
+    for i in range(count):
+        mid = f"{random.randint(0, 999)}{1718000000000 + i} 0"
+        kind = random.random()
+        if kind < 0.6:
+            payload = base64.b64encode(os.urandom(random.randint(300, 900))).decode()
+            frame = {
+                "lwp": "/s/para",
+                "headers": {"mid": mid, "sid": f"sid{i % 7}", "app-key": "444e9908a51d1cb236a27862abc769c9",
+                            "ua": UA, "dt": "j"},
+                "body": {"syncPushPackage": {"data": [
+                    {"data": payload, "objectType": 40000, "pts": (1718000000000 + i) * 1000, "seq": i}
+                ]}},
+            }
+        elif kind < 0.9:
+            frame = {"code": 200, "headers": {"mid": mid}}
+        else:
+            frame = {"code": 200, "headers": {"mid": mid, "sid": f"sid{i % 7}"},
+                     "body": {"uuid": f"-{i}", "createAt": 1718000000000 + i}}
+        frames.append(json.dumps(frame))
+    return frames
+
+
+def load_frames(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def legacy_ack(message_data):
+    """旧实现主循环中的ACK"""
+    ack = {
+        "code": 200,
+        "headers": {
+            "mid": message_data["headers"]["mid"],
+            "sid": message_data["headers"].get("sid", "")
+        }
+    }
+    for key in ["app-key", "ua", "dt"]:
+        if key in message_data["headers"]:
+            ack["headers"][key] = message_data["headers"][key]
+    return json.dumps(ack)
+
+
+def legacy_path(frames):
+    """旧路径：解析、主循环ACK、handle_message再ACK一次（心跳响应之外的每帧两次ACK）"""
+    sent = 0
+    for raw in frames:
+        message_data = json.loads(raw)
+        if "code" in message_data and message_data["code"] == 200:
+            continue  # 心跳响应及其他回执，与handle_heartbeat_response一致，不ACK
+        if "headers" in message_data and "mid" in message_data["headers"]:
+            sent += len(legacy_ack(message_data))
+        try:
+            message = message_data
+            ack = {
+                "code": 200,
+                "headers": {
+                    "mid": message["headers"]["mid"] if "mid" in message["headers"] else "",
+                    "sid": message["headers"]["sid"] if "sid" in message["headers"] else '',
+                }
+            }
+            if 'app-key' in message["headers"]:
+                ack["headers"]["app-key"] = message["headers"]["app-key"]
+            if 'ua' in message["headers"]:
+                ack["headers"]["ua"] = message["headers"]["ua"]
+            if 'dt' in message["headers"]:
+                ack["headers"]["dt"] = message["headers"]["dt"]
+            sent += len(json.dumps(ack))
+        except Exception:
+            pass
+    return sent
+
+
+def current_path(frames):
+    """当前路径：解析一次、按模板ACK一次"""
+    sent = 0
+    for raw in frames:
+        message_data = fastjson.loads(raw)
+        if "code" in message_data and message_data["code"] == 200:
+            continue  # 心跳响应及其他回执，与handle_heartbeat_response一致，不ACK
+        headers = message_data.get("headers") if isinstance(message_data, dict) else None
+        if headers and "mid" in headers:
+            sent += len(build_ack(headers))
+    return sent
+
+
+def bench(fn, frames, rounds):
+    best = float("inf")
+    sent = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        sent = fn(frames)
+        best = min(best, time.perf_counter() - start)
+    return best / len(frames) * 1e6, sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket接收路径基准测试")
+    parser.add_argument("--frames", help="录制的原始帧文件，每行一条")
+    parser.add_argument("--count", type=int, default=20000, help="未指定--frames时生成的样本帧数")
+    parser.add_argument("--rounds", type=int, default=5, help="重复轮数，取最快一轮")
+    args = parser.parse_args()
+
+    random.seed(0)
+    frames = load_frames(args.frames) if args.frames else sample_frames(args.count)
+    for raw in frames[:50]:
+        message_data = json.loads(raw)
+        headers = message_data.get("headers", {})
+        if "mid" in headers:
+            assert json.loads(build_ack(headers)) == json.loads(legacy_ack(message_data))
+
+    legacy_us, legacy_sent = bench(legacy_path, frames, args.rounds)
+    current_us, current_sent = bench(current_path, frames, args.rounds)
+    print(f"帧数: {len(frames)}，JSON后端: {'orjson' if fastjson.ORJSON_AVAILABLE else 'json'}")
+    print(f"旧路径:   {legacy_us:.2f} us/帧，ACK上行 {legacy_sent / len(frames):.0f} 字节/帧")
+    print(f"当前路径: {current_us:.2f} us/帧，ACK上行 {current_sent / len(frames):.0f} 字节/帧 "
+          f"({legacy_us / current_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
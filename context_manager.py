@@ -1,10 +1,84 @@
 import sqlite3
 import os
 import json
-from datetime import datetime
+import gzip
+import time
+import threading
+import atexit
+import asyncio
+from collections import OrderedDict, Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from loguru import logger
 
 
+class SQLiteConnectionManager:
+    """
+    SQLite连接管理器
+    
+    为每个线程维护一个长连接，避免每次操作都重新打开数据库文件。
+    连接启用WAL日志模式并调优缓存相关PRAGMA，sqlite3模块会按SQL文本缓存预编译语句，
+    因此调用方应使用固定的SQL字符串以复用预编译语句。
+    """
+    
+    def __init__(self, db_path, cache_size_kb=8192, mmap_size=64 * 1024 * 1024, cached_statements=128):
+        """
+        初始化连接管理器
+        
+        Args:
+            db_path: SQLite数据库文件路径
+            cache_size_kb: 每个连接的页缓存大小(KB)
+            mmap_size: 内存映射大小(字节)
+            cached_statements: 每个连接缓存的预编译语句数量
+        """
+        self.db_path = db_path
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        
+    def _connect(self):
+        """创建并调优新连接"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,  # 仅用于close_all在其他线程关闭连接，每个线程只使用自己的连接
+            cached_statements=self.cached_statements,
+        )
+        # 必须在切换WAL之前设置：切换WAL会初始化新数据库文件，之后auto_vacuum只能通过完整VACUUM更改
+        # 已有数据库上该设置不生效，由维护任务转换
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL模式下NORMAL可保证一致性，仅在断电时可能丢失最近事务
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+        
+    def get_connection(self):
+        """获取当前线程的长连接，不存在时创建"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    
+    def close_all(self):
+        """关闭所有线程的连接"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.warning(f"关闭数据库连接时出错: {e}")
+        self._local = threading.local()
+
+
 class ChatContextManager:
     """
     聊天上下文管理器
@@ -13,26 +87,59 @@ class ChatContextManager:
     支持按会话ID检索对话历史，以及议价次数统计。
     """
     
-    def __init__(self, max_history=100, db_path="data/chat_history.db"):
+    def __init__(self, max_history=100, db_path="data/chat_history.db", write_batch_rows=100, write_flush_interval=0.2,
+                 context_cache_size=1000, context_cache_ttl=1800, trim_slack=None):
         """
         初始化聊天上下文管理器
         
         Args:
             max_history: 每个对话保留的最大消息数
             db_path: SQLite数据库文件路径
+            write_batch_rows: 写缓冲积累多少条消息后立即落盘，小于等于1时关闭写缓冲
+            write_flush_interval: 写缓冲定时落盘间隔（秒）
+            context_cache_size: 内存中缓存的会话窗口数量上限，为0时关闭缓存
+            context_cache_ttl: 会话窗口缓存过期时间（秒）
+            trim_slack: 会话累计写入多少条消息后才清理一次旧消息，默认max_history的1/5
         """
         self.max_history = max_history
         self.db_path = db_path
+        self._ensure_db_dir()
+        self.db = SQLiteConnectionManager(db_path)
         self._init_db()
         
-    def _init_db(self):
-        """初始化数据库表结构"""
-        # 确保数据库目录存在
+        # 写缓冲：多个会话的消息合并到一个事务中批量写入，读取时叠加未落盘的消息
+        self.write_batch_rows = write_batch_rows
+        self.write_flush_interval = write_flush_interval
+        self._pending = []  # (user_id, item_id, role, content, timestamp, chat_id)
+        self._write_lock = threading.RLock()
+        self._flush_event = threading.Event()
+        self._closed = False
+        # 均摊清理：记录每个会话自上次清理后写入的消息数，超过trim_slack才执行一次清理
+        self.trim_slack = trim_slack if trim_slack is not None else max(1, max_history // 5)
+        self._untrimmed = {}
+        self._flush_thread = None
+        if self.write_batch_rows > 1:
+            self._flush_thread = threading.Thread(target=self._flush_loop, name="chat-db-flush", daemon=True)
+            self._flush_thread.start()
+            atexit.register(self.flush)
+            
+        # 会话窗口LRU缓存：chat_id -> {"rows": [(role, content)], "bargain_count": int, "expires_at": float}
+        self.context_cache_size = context_cache_size
+        self.context_cache_ttl = context_cache_ttl
+        self._context_cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        
+    def _ensure_db_dir(self):
+        """确保数据库目录存在"""
         db_dir = os.path.dirname(self.db_path)
         if db_dir and not os.path.exists(db_dir):
             os.makedirs(db_dir)
-            
-        conn = sqlite3.connect(self.db_path)
+        
+    def _init_db(self):
+        """初始化数据库表结构"""
+        conn = self.db.get_connection()
         cursor = conn.cursor()
         
         # 创建消息表
@@ -60,8 +167,14 @@ class ChatContextManager:
         CREATE INDEX IF NOT EXISTS idx_user_item ON messages (user_id, item_id)
         ''')
         
+        # (chat_id, id)复合索引覆盖按会话取最新窗口与清理旧消息的查询，
+        # 自增id与插入顺序一致，无需再按ISO字符串时间戳排序；它同时取代了单列的chat_id索引
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_chat_id_id ON messages (chat_id, id)
+        ''')
+        
         cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_chat_id ON messages (chat_id)
+        DROP INDEX IF EXISTS idx_chat_id
         ''')
         
         cursor.execute('''
@@ -89,10 +202,77 @@ class ChatContextManager:
         ''')
         
         conn.commit()
-        conn.close()
         logger.info(f"聊天历史数据库初始化完成: {self.db_path}")
         
-
+    def close(self):
+        """落盘写缓冲并关闭数据库连接"""
+        self._closed = True
+        self._flush_event.set()
+        if self._flush_thread and self._flush_thread is not threading.current_thread():
+            self._flush_thread.join(timeout=5)
+        self.flush()
+        atexit.unregister(self.flush)
+        self.db.close_all()
+        
+    def _flush_loop(self):
+        """后台定时落盘写缓冲"""
+        while not self._closed:
+            self._flush_event.wait(self.write_flush_interval)
+            self._flush_event.clear()
+            self.flush()
+            
+    def flush(self):
+        """
+        将写缓冲中的消息在一个事务中写入数据库，并清理超出上限的旧消息
+        
+        写入失败时消息保留在缓冲中，等待下次落盘重试
+        
+        Returns:
+            int: 本次写入的消息数
+        """
+        with self._write_lock:
+            if not self._pending:
+                return 0
+            batch = list(self._pending)
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(
+                    "INSERT INTO messages (user_id, item_id, role, content, timestamp, chat_id) VALUES (?, ?, ?, ?, ?, ?)",
+                    batch
+                )
+                trimmed = []
+                for chat_id, count in Counter(row[5] for row in batch).items():
+                    untrimmed = self._untrimmed.get(chat_id, 0) + count
+                    self._untrimmed[chat_id] = untrimmed
+                    if untrimmed >= self.trim_slack:
+                        self._trim_chat(cursor, chat_id)
+                        trimmed.append(chat_id)
+                conn.commit()
+            except Exception as e:
+                logger.error(f"批量写入消息时出错: {e}")
+                conn.rollback()
+                return 0
+            for chat_id in trimmed:
+                self._untrimmed.pop(chat_id, None)
+            # 提交成功后才从缓冲移除，持有锁保证读取方不会重复或遗漏
+            del self._pending[:len(batch)]
+            return len(batch)
+            
+    def _trim_chat(self, cursor, chat_id):
+        """清理会话中超出max_history的旧消息，只保留最新的max_history条"""
+        cursor.execute(
+            """
+            DELETE FROM messages 
+            WHERE chat_id = ? AND id < (
+                SELECT id FROM messages 
+                WHERE chat_id = ? 
+                ORDER BY id DESC 
+                LIMIT 1 OFFSET ?
+            )
+            """, 
+            (chat_id, chat_id, self.max_history - 1)
+        )
             
     def save_item_info(self, item_id, item_data):
         """
@@ -102,7 +282,7 @@ class ChatContextManager:
             item_id: 商品ID
             item_data: 商品信息字典
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.get_connection()
         cursor = conn.cursor()
         
         try:
@@ -131,8 +311,6 @@ class ChatContextManager:
         except Exception as e:
             logger.error(f"保存商品信息时出错: {e}")
             conn.rollback()
-        finally:
-            conn.close()
     
     def get_item_info(self, item_id):
         """
@@ -144,7 +322,7 @@ class ChatContextManager:
         Returns:
             dict: 商品信息字典，如果不存在返回None
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.get_connection()
         cursor = conn.cursor()
         
         try:
@@ -160,54 +338,66 @@ class ChatContextManager:
         except Exception as e:
             logger.error(f"获取商品信息时出错: {e}")
             return None
-        finally:
-            conn.close()
 
-    def add_message_by_chat(self, chat_id, user_id, item_id, role, content):
+    def get_item_record(self, item_id):
         """
-        基于会话ID添加新消息到对话历史
+        从数据库获取商品信息及其更新时间
         
         Args:
-            chat_id: 会话ID
-            user_id: 用户ID (用户消息存真实user_id，助手消息存卖家ID)
             item_id: 商品ID
-            role: 消息角色 (user/assistant)
-            content: 消息内容
+            
+        Returns:
+            tuple: (商品信息字典, 更新时间戳)，如果不存在返回None
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.get_connection()
         cursor = conn.cursor()
         
         try:
-            # 插入新消息，使用chat_id作为额外标识
             cursor.execute(
-                "INSERT INTO messages (user_id, item_id, role, content, timestamp, chat_id) VALUES (?, ?, ?, ?, ?, ?)",
-                (user_id, item_id, role, content, datetime.now().isoformat(), chat_id)
-            )
-            
-            # 检查是否需要清理旧消息（基于chat_id）
-            cursor.execute(
-                """
-                SELECT id FROM messages 
-                WHERE chat_id = ? 
-                ORDER BY timestamp DESC 
-                LIMIT ?, 1
-                """, 
-                (chat_id, self.max_history)
+                "SELECT data, last_updated FROM items WHERE item_id = ?",
+                (item_id,)
             )
             
-            oldest_to_keep = cursor.fetchone()
-            if oldest_to_keep:
-                cursor.execute(
-                    "DELETE FROM messages WHERE chat_id = ? AND id < ?",
-                    (chat_id, oldest_to_keep[0])
-                )
-            
-            conn.commit()
+            result = cursor.fetchone()
+            if result:
+                try:
+                    updated_at = datetime.fromisoformat(result[1]).timestamp()
+                except (TypeError, ValueError):
+                    updated_at = 0
+                return json.loads(result[0]), updated_at
+            return None
         except Exception as e:
-            logger.error(f"添加消息到数据库时出错: {e}")
-            conn.rollback()
-        finally:
-            conn.close()
+            logger.error(f"获取商品信息时出错: {e}")
+            return None
+
+    def add_message_by_chat(self, chat_id, user_id, item_id, role, content):
+        """
+        基于会话ID添加新消息到对话历史
+        
+        消息先进入写缓冲，由后台线程定时或缓冲满时批量落盘
+        
+        Args:
+            chat_id: 会话ID
+            user_id: 用户ID (用户消息存真实user_id，助手消息存卖家ID)
+            item_id: 商品ID
+            role: 消息角色 (user/assistant)
+            content: 消息内容
+        """
+        row = (user_id, item_id, role, content, datetime.now().isoformat(), chat_id)
+        with self._write_lock:
+            self._pending.append(row)
+            pending_rows = len(self._pending)
+            # 增量更新已缓存的会话窗口
+            entry = self._context_cache.get(chat_id)
+            if entry is not None:
+                entry["rows"].append((role, content))
+                del entry["rows"][:-self.max_history]
+        
+        # 未启用写缓冲或缓冲已满时立即落盘
+        if self.write_batch_rows <= 1:
+            self.flush()
+        elif pending_rows >= self.write_batch_rows:
+            self._flush_event.set()
 
     def get_context_by_chat(self, chat_id):
         """
@@ -219,24 +409,36 @@ class ChatContextManager:
         Returns:
             list: 包含对话历史的列表
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute(
-                """
-                SELECT role, content FROM messages 
-                WHERE chat_id = ? 
-                ORDER BY timestamp ASC
-                LIMIT ?
-                """, 
-                (chat_id, self.max_history)
-            )
+            # 持有写锁，保证数据库结果与写缓冲叠加时不会重复或遗漏正在落盘的消息
+            with self._write_lock:
+                cached = self._get_cached_window(chat_id)
+                if cached is not None:
+                    rows, bargain_count = cached
+                else:
+                    conn = self.db.get_connection()
+                    cursor = conn.cursor()
+                    # 通过(chat_id, id)索引倒序取最新的max_history条，再按时间正序返回
+                    cursor.execute(
+                        """
+                        SELECT role, content FROM (
+                            SELECT id, role, content FROM messages 
+                            WHERE chat_id = ? 
+                            ORDER BY id DESC
+                            LIMIT ?
+                        ) ORDER BY id ASC
+                        """, 
+                        (chat_id, self.max_history)
+                    )
+                    rows = cursor.fetchall()
+                    rows.extend((row[2], row[3]) for row in self._pending if row[5] == chat_id)
+                    rows = rows[-self.max_history:]
+                    bargain_count = self.get_bargain_count_by_chat(chat_id)
+                    self._cache_window(chat_id, rows, bargain_count)
             
-            messages = [{"role": role, "content": content} for role, content in cursor.fetchall()]
+            messages = [{"role": role, "content": content} for role, content in rows]
             
-            # 获取议价次数并添加到上下文中
-            bargain_count = self.get_bargain_count_by_chat(chat_id)
+            # 添加议价次数到上下文中
             if bargain_count > 0:
                 messages.append({
                     "role": "system", 
@@ -246,11 +448,53 @@ class ChatContextManager:
         except Exception as e:
             logger.error(f"获取对话历史时出错: {e}")
             messages = []
-        finally:
-            conn.close()
         
         return messages
 
+    def _get_cached_window(self, chat_id):
+        """
+        从LRU缓存读取会话窗口，调用方需持有写锁
+        
+        Returns:
+            tuple: (消息列表副本, 议价次数)，未命中或已过期返回None
+        """
+        if self.context_cache_size <= 0:
+            return None
+        entry = self._context_cache.get(chat_id)
+        if entry is None or entry["expires_at"] < time.time():
+            if entry is not None:
+                del self._context_cache[chat_id]
+            self.cache_misses += 1
+            return None
+        self._context_cache.move_to_end(chat_id)
+        self.cache_hits += 1
+        return list(entry["rows"]), entry["bargain_count"]
+
+    def _cache_window(self, chat_id, rows, bargain_count):
+        """写入会话窗口缓存并按容量淘汰最久未使用的会话，调用方需持有写锁"""
+        if self.context_cache_size <= 0:
+            return
+        self._context_cache[chat_id] = {
+            "rows": list(rows),
+            "bargain_count": bargain_count,
+            "expires_at": time.time() + self.context_cache_ttl,
+        }
+        self._context_cache.move_to_end(chat_id)
+        while len(self._context_cache) > self.context_cache_size:
+            self._context_cache.popitem(last=False)
+            self.cache_evictions += 1
+
+    def get_cache_stats(self):
+        """获取会话窗口缓存统计"""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "size": len(self._context_cache),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "evictions": self.cache_evictions,
+            "hit_rate": self.cache_hits / lookups if lookups else 0.0,
+        }
+
     def increment_bargain_count_by_chat(self, chat_id):
         """
         基于会话ID增加议价次数
@@ -258,7 +502,7 @@ class ChatContextManager:
         Args:
             chat_id: 会话ID
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.get_connection()
         cursor = conn.cursor()
         
         try:
@@ -274,12 +518,14 @@ class ChatContextManager:
             )
             
             conn.commit()
+            with self._write_lock:
+                entry = self._context_cache.get(chat_id)
+                if entry is not None:
+                    entry["bargain_count"] += 1
             logger.debug(f"会话 {chat_id} 议价次数已增加")
         except Exception as e:
             logger.error(f"增加议价次数时出错: {e}")
             conn.rollback()
-        finally:
-            conn.close()
 
     def get_bargain_count_by_chat(self, chat_id):
         """
@@ -291,7 +537,14 @@ class ChatContextManager:
         Returns:
             int: 议价次数
         """
-        conn = sqlite3.connect(self.db_path)
+        with self._write_lock:
+            entry = self._context_cache.get(chat_id)
+            if entry is not None:
+                if entry["expires_at"] >= time.time():
+                    return entry["bargain_count"]
+                del self._context_cache[chat_id]
+                
+        conn = self.db.get_connection()
         cursor = conn.cursor()
         
         try:
@@ -305,5 +558,265 @@ class ChatContextManager:
         except Exception as e:
             logger.error(f"获取议价次数时出错: {e}")
             return 0
+
+    def run_maintenance(self, retention_days=30, bargain_ttl_days=30, item_ttl_days=30, archive_dir="data/archive",
+                        full_vacuum=False):
+        """
+        执行数据库保留与压缩任务
+        
+        1. 将空闲超过retention_days的会话归档到gzip压缩的JSONL冷存储后删除
+        2. 清理超过bargain_ttl_days未更新的议价计数与超过item_ttl_days未更新的商品缓存
+        3. 执行增量VACUUM与PRAGMA optimize
+        
+        Args:
+            retention_days: 会话空闲多少天后归档
+            bargain_ttl_days: 议价计数过期天数
+            item_ttl_days: 商品信息过期天数
+            archive_dir: 归档文件目录
+            full_vacuum: 旧数据库是否执行一次完整VACUUM以转换为增量VACUUM模式
+            
+        Returns:
+            dict: 维护报告，包含归档/清理数量、数据库大小与回收页数
+        """
+        start = time.time()
+        before = self.get_db_stats()
+        report = {
+            "archived_chats": 0,
+            "archived_messages": 0,
+            "archive_file": None,
+            "purged_bargain_counts": 0,
+            "purged_items": 0,
+        }
+        
+        try:
+            archived = self.archive_idle_chats(retention_days, archive_dir)
+            report.update(archived)
+            report["purged_bargain_counts"] = self._purge_older_than("chat_bargain_counts", bargain_ttl_days)
+            report["purged_items"] = self._purge_older_than("items", item_ttl_days)
+            self.compact(full_vacuum)
+        except Exception as e:
+            logger.error(f"数据库维护任务出错: {e}")
+            report["error"] = str(e)
+            
+        after = self.get_db_stats()
+        report.update({
+            "size_before": before["size"],
+            "size_after": after["size"],
+            "reclaimed_pages": max(0, before["page_count"] - after["page_count"]),
+            "free_pages": after["freelist_count"],
+            "elapsed": time.time() - start,
+        })
+        return report
+        
+    def archive_idle_chats(self, retention_days, archive_dir="data/archive"):
+        """
+        将空闲超过retention_days的会话消息归档到gzip压缩的JSONL文件并从数据库删除
+        
+        先写入并同步归档文件再删除数据库记录，中途崩溃最多导致重复归档，不会丢失消息。
+        只在删除时短暂持有写锁，归档期间重新活跃的会话不删除，之后再次归档时可能重复写入归档文件。
+        
+        Args:
+            retention_days: 会话空闲多少天后归档
+            archive_dir: 归档文件目录
+            
+        Returns:
+            dict: archived_chats, archived_messages, archive_file
+        """
+        result = {"archived_chats": 0, "archived_messages": 0, "archive_file": None}
+        cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+        self.flush()
+        
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT chat_id FROM messages WHERE chat_id IS NOT NULL GROUP BY chat_id HAVING MAX(timestamp) < ?",
+            (cutoff,)
+        )
+        chat_ids = [row[0] for row in cursor.fetchall()]
+        if not chat_ids:
+            return result
+            
+        archive_file = os.path.join(archive_dir, f"messages-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+        archived_counts = {}  # chat_id -> 归档消息数
+        f = None  # 有消息时才创建归档文件
+        try:
+            for chat_id in chat_ids:
+                cursor.execute(
+                    "SELECT id, user_id, item_id, role, content, timestamp, chat_id FROM messages WHERE chat_id = ? ORDER BY id",
+                    (chat_id,)
+                )
+                for row in cursor.fetchall():
+                    if f is None:
+                        os.makedirs(archive_dir, exist_ok=True)
+                        f = gzip.open(archive_file, "wt", encoding="utf-8")
+                    f.write(json.dumps(dict(zip(
+                        ("id", "user_id", "item_id", "role", "content", "timestamp", "chat_id"), row
+                    )), ensure_ascii=False) + "\n")
+                    archived_counts[chat_id] = archived_counts.get(chat_id, 0) + 1
+            if f is None:
+                return result
+            f.flush()
+            os.fsync(f.fileno())
         finally:
-            conn.close() 
\ No newline at end of file
+            if f is not None:
+                f.close()
+                
+        # 落盘在写锁内进行，持有写锁删除可保证期间没有新消息写入；归档期间有新消息的会话保留
+        # 逐个会话删除并提交，每次只短暂持有写锁
+        deleted = []
+        for chat_id in archived_counts:
+            with self._write_lock:
+                if any(row[5] == chat_id for row in self._pending):
+                    continue
+                try:
+                    cursor.execute(
+                        "DELETE FROM messages WHERE chat_id = ? AND NOT EXISTS "
+                        "(SELECT 1 FROM messages WHERE chat_id = ? AND timestamp >= ?)",
+                        (chat_id, chat_id, cutoff)
+                    )
+                    if cursor.rowcount <= 0:
+                        conn.rollback()
+                        continue
+                    cursor.execute("DELETE FROM chat_bargain_counts WHERE chat_id = ?", (chat_id,))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                self._context_cache.pop(chat_id, None)
+                self._untrimmed.pop(chat_id, None)
+            deleted.append(chat_id)
+            
+        archived_messages = sum(archived_counts[chat_id] for chat_id in deleted)
+        logger.info(f"已归档 {len(deleted)} 个空闲会话的 {archived_messages} 条消息: {archive_file}")
+        result.update({
+            "archived_chats": len(deleted),
+            "archived_messages": archived_messages,
+            "archive_file": archive_file,
+        })
+        return result
+        
+    def _purge_older_than(self, table, days):
+        """删除表中last_updated早于days天前的记录，返回删除数量"""
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"DELETE FROM {table} WHERE last_updated < ?", (cutoff,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if table == "chat_bargain_counts" and cursor.rowcount:
+            # 议价计数已清理，缓存中的计数随之失效
+            with self._write_lock:
+                self._context_cache.clear()
+        return cursor.rowcount
+        
+    def compact(self, full_vacuum=False):
+        """
+        执行增量VACUUM与PRAGMA optimize
+        
+        旧数据库需要一次完整VACUUM才能转换为增量VACUUM模式，完整VACUUM期间其他写入会被阻塞，
+        因此只在full_vacuum为True时执行，否则只做optimize与WAL检查点
+        """
+        conn = self.db.get_connection()
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if auto_vacuum == 2:
+            conn.execute("PRAGMA incremental_vacuum")
+        elif full_vacuum:
+            logger.info("数据库转换为增量VACUUM模式，执行一次完整VACUUM...")
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        else:
+            logger.info("数据库未启用增量VACUUM，跳过空间回收；设置DB_FULL_VACUUM=true可在维护时执行一次完整VACUUM进行转换")
+        conn.execute("PRAGMA optimize")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        
+    def get_db_stats(self):
+        """获取数据库文件大小与页统计"""
+        conn = self.db.get_connection()
+        size = 0
+        for path in (self.db_path, self.db_path + "-wal"):
+            if os.path.exists(path):
+                size += os.path.getsize(path)
+        return {
+            "size": size,
+            "page_count": conn.execute("PRAGMA page_count").fetchone()[0],
+            "freelist_count": conn.execute("PRAGMA freelist_count").fetchone()[0],
+        }
+
+
+class AsyncChatContextManager:
+    """
+    异步聊天上下文管理器
+    
+    所有数据库操作都提交到一个专用的数据库线程串行执行，
+    协程中await调用不会因磁盘I/O阻塞事件循环（心跳、消息接收等）。
+    耗时的维护任务在单独的维护线程中执行（每个线程使用自己的连接），不占用数据库线程。
+    """
+    
+    def __init__(self, max_history=100, db_path="data/chat_history.db", **kwargs):
+        """
+        初始化异步聊天上下文管理器
+        
+        Args:
+            max_history: 每个对话保留的最大消息数
+            db_path: SQLite数据库文件路径
+            **kwargs: 透传给ChatContextManager的写缓冲、会话缓存参数
+        """
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-db")
+        # 在数据库线程中初始化，使建表连接与后续操作共用同一个线程连接
+        self.manager = self.executor.submit(ChatContextManager, max_history, db_path, **kwargs).result()
+        self.maintenance_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-db-maint")
+        
+    async def _run(self, func, *args):
+        """在数据库线程中执行同步方法"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+    
+    async def add_message(self, chat_id, user_id, item_id, role, content):
+        """基于会话ID添加新消息到对话历史"""
+        return await self._run(self.manager.add_message_by_chat, chat_id, user_id, item_id, role, content)
+    
+    async def get_context(self, chat_id):
+        """基于会话ID获取对话历史"""
+        return await self._run(self.manager.get_context_by_chat, chat_id)
+    
+    async def get_item_info(self, item_id):
+        """从数据库获取商品信息"""
+        return await self._run(self.manager.get_item_info, item_id)
+    
+    async def get_item_record(self, item_id):
+        """从数据库获取商品信息及其更新时间"""
+        return await self._run(self.manager.get_item_record, item_id)
+    
+    async def save_item_info(self, item_id, item_data):
+        """保存商品信息到数据库"""
+        return await self._run(self.manager.save_item_info, item_id, item_data)
+    
+    async def increment_bargain_count(self, chat_id):
+        """基于会话ID增加议价次数"""
+        return await self._run(self.manager.increment_bargain_count_by_chat, chat_id)
+    
+    async def get_bargain_count(self, chat_id):
+        """基于会话ID获取议价次数"""
+        return await self._run(self.manager.get_bargain_count_by_chat, chat_id)
+    
+    def get_cache_stats(self):
+        """获取会话窗口缓存统计"""
+        return self.manager.get_cache_stats()
+    
+    async def run_maintenance(self, **kwargs):
+        """在维护线程中执行保留与压缩任务，期间消息读写不受影响"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.maintenance_executor, lambda: self.manager.run_maintenance(**kwargs))
+    
+    async def flush(self):
+        """立即落盘写缓冲"""
+        return await self._run(self.manager.flush)
+    
+    async def close(self):
+        """等待维护任务结束，在数据库线程中落盘写缓冲、关闭连接并停止线程"""
+        await asyncio.to_thread(self.maintenance_executor.shutdown, wait=True, cancel_futures=True)
+        await self._run(self.manager.close)
+        self.executor.shutdown(wait=True)
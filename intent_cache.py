@@ -0,0 +1,142 @@
+import re
+import json
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from loguru import logger
+from utils import atomic_json
+
+
+class IntentCache:
+    """
+    大模型意图分类结果缓存
+
+    以规整后的消息文本为键缓存大模型的分类结果，"还在吗"、"在吗？"等常见说法再次出现时直接返回。
+    内存中按LRU淘汰，超过ttl的结果视为过期；缓存按save_interval节流原子写入文件，重启后继续使用。
+    所有操作都在锁内完成。
+    """
+
+    _clean_pattern = re.compile(r'[^\w一-龥]')
+
+    def __init__(self, path="data/intent_cache.json", max_size=5000, ttl=7 * 86400, save_interval=60.0):
+        """
+        初始化意图缓存
+
+        Args:
+            path: 缓存文件路径，为空时不持久化
+            max_size: 缓存条数上限
+            ttl: 分类结果有效期（秒）
+            save_interval: 两次写入文件的最小间隔（秒）
+        """
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.save_interval = save_interval
+        self._entries = OrderedDict()  # 规整后的文本 -> (意图, 缓存时间)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # 保证后取的快照后写入
+        self._dirty = False
+        self._last_save = time.time()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._load()
+
+    @classmethod
+    def normalize(cls, text: str) -> str:
+        """全角转半角、去除标点和空白、英文转小写"""
+        return cls._clean_pattern.sub('', unicodedata.normalize('NFKC', text)).lower()
+
+    def _load(self):
+        """从文件加载未过期的缓存，文件不存在或损坏时从空缓存开始"""
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            expire_before = time.time() - self.ttl
+            for key, intent, cached_at in entries[-self.max_size:]:
+                if cached_at > expire_before:
+                    self._entries[key] = (intent, cached_at)
+            logger.info(f"加载意图缓存: {len(self._entries)} 条")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"意图缓存文件读取失败，将从空缓存开始: {e}")
+
+    def get(self, text: str) -> Optional[str]:
+        """
+        查询缓存的意图
+
+        Returns:
+            str: 缓存的意图，未命中或已过期时返回None
+        """
+        key = self.normalize(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            intent, cached_at = entry
+            if time.time() - cached_at >= self.ttl:
+                del self._entries[key]
+                self._dirty = True
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return intent
+
+    def put(self, text: str, intent: str):
+        """缓存大模型的分类结果"""
+        key = self.normalize(text)
+        if not key or not intent:
+            return
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (intent, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            self._dirty = True
+            due = now - self._last_save >= self.save_interval
+        if due:
+            self.save()
+
+    def clear(self):
+        """清空缓存（分类提示词变化后旧结果不再可靠）"""
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+        self.save()
+
+    def save(self):
+        """将未保存的缓存写入文件"""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                entries = [[key, intent, cached_at] for key, (intent, cached_at) in self._entries.items()]
+                self._dirty = False
+                self._last_save = time.time()
+            try:
+                atomic_json.write_json(self.path, entries, ensure_ascii=False)
+            except Exception as e:
+                logger.error(f"保存意图缓存失败: {e}")
+                with self._lock:
+                    self._dirty = True
+
+    def get_stats(self):
+        """获取缓存条数、命中与淘汰统计"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": len(self._entries),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            }
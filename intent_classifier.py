@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import math
+import time
+import random
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+from utils import atomic_json
+
+
+class IntentSampleLog:
+    """
+    意图分类样本记录
+
+    大模型分类时把(消息, 分类结果)追加到JSONL文件，作为本地分类器的训练数据。
+    """
+
+    def __init__(self, path="data/intent_samples.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()  # 保证并发追加的记录不会交错
+
+    def append(self, text: str, label: str):
+        """追加一条样本，写入失败只记录日志"""
+        record = json.dumps({"text": text, "label": label, "ts": int(time.time())}, ensure_ascii=False)
+        try:
+            with self._lock:
+                dir_name = os.path.dirname(self.path)
+                if dir_name:
+                    os.makedirs(dir_name, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(record + "\n")
+        except Exception as e:
+            logger.warning(f"记录意图样本失败: {e}")
+
+
+def load_samples(path: str) -> List[Tuple[str, str]]:
+    """读取样本文件，同一消息多次出现时保留最后一次的标注"""
+    samples = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            text, label = record.get("text"), record.get("label")
+            if text and label:
+                samples[text] = label
+    return list(samples.items())
+
+
+class CharNgramClassifier:
+    """
+    字符n-gram TF-IDF + 多分类逻辑回归
+
+    纯Python实现，只依赖标准库，CPU上单条预测为微秒级。
+    用大模型的历史分类结果离线训练，线上置信度达到阈值时代替大模型分类。
+    """
+
+    VERSION = 1
+
+    def __init__(self, ngram_range=(1, 3), min_df=2):
+        """
+        Args:
+            ngram_range: 字符n-gram的最小与最大长度
+            min_df: 特征至少出现在多少条样本中
+        """
+        self.ngram_range = tuple(ngram_range)
+        self.min_df = min_df
+        self.labels: List[str] = []
+        self.idf: Dict[str, float] = {}
+        self.weights: Dict[str, Dict[str, float]] = {}
+        self.bias: Dict[str, float] = {}
+        self._clean = re.compile(r'[^\w一-龥]')
+
+    def _ngrams(self, text: str) -> Counter:
+        text = f"^{self._clean.sub('', text).lower()}$"
+        low, high = self.ngram_range
+        grams = Counter()
+        for n in range(low, high + 1):
+            for i in range(len(text) - n + 1):
+                grams[text[i:i + n]] += 1
+        return grams
+
+    def _vectorize(self, text: str) -> Dict[str, float]:
+        """TF-IDF向量（L2归一化），训练集中没有的特征被忽略"""
+        idf = self.idf
+        vec = {g: (1 + math.log(tf)) * idf[g] for g, tf in self._ngrams(text).items() if g in idf}
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        if norm:
+            for g in vec:
+                vec[g] /= norm
+        return vec
+
+    def _scores(self, vec: Dict[str, float]) -> Dict[str, float]:
+        scores = {}
+        for label in self.labels:
+            w = self.weights[label]
+            scores[label] = self.bias[label] + sum(v * w.get(g, 0.0) for g, v in vec.items())
+        return scores
+
+    @staticmethod
+    def _softmax(scores: Dict[str, float]) -> Dict[str, float]:
+        top = max(scores.values())
+        exp = {label: math.exp(s - top) for label, s in scores.items()}
+        total = sum(exp.values())
+        return {label: e / total for label, e in exp.items()}
+
+    def fit(self, samples: List[Tuple[str, str]], epochs=15, learning_rate=0.5, l2=1e-4, seed=0):
+        """
+        训练模型
+
+        Args:
+            samples: (消息, 标签) 列表
+            epochs: SGD轮数
+            learning_rate: 初始学习率，按轮次衰减
+            l2: L2正则系数
+        """
+        df = Counter()
+        for text, _ in samples:
+            df.update(self._ngrams(text).keys())
+        total = len(samples)
+        self.idf = {g: math.log((1 + total) / (1 + c)) + 1 for g, c in df.items() if c >= self.min_df}
+        self.labels = sorted({label for _, label in samples})
+        self.weights = {label: {} for label in self.labels}
+        self.bias = {label: 0.0 for label in self.labels}
+
+        data = [(self._vectorize(text), label) for text, label in samples]
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            lr = learning_rate / (1 + epoch)
+            for vec, label in data:
+                probs = self._softmax(self._scores(vec))
+                for cls in self.labels:
+                    grad = probs[cls] - (1.0 if cls == label else 0.0)
+                    if abs(grad) < 1e-6:
+                        continue
+                    w = self.weights[cls]
+                    for g, v in vec.items():
+                        w[g] = w.get(g, 0.0) * (1 - lr * l2) - lr * grad * v
+                    self.bias[cls] -= lr * grad
+        # 去掉接近0的权重，减小模型文件
+        for label in self.labels:
+            self.weights[label] = {g: w for g, w in self.weights[label].items() if abs(w) >= 1e-4}
+        return self
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        预测意图
+
+        Returns:
+            Tuple: (标签, 置信度)，模型为空或没有任何已知特征时返回(None, 0.0)
+        """
+        if not self.labels:
+            return None, 0.0
+        vec = self._vectorize(text)
+        if not vec:
+            return None, 0.0
+        probs = self._softmax(self._scores(vec))
+        label = max(probs, key=probs.get)
+        return label, probs[label]
+
+    def save(self, path: str):
+        model = {
+            "version": self.VERSION,
+            "ngram_range": list(self.ngram_range),
+            "min_df": self.min_df,
+            "labels": self.labels,
+            "idf": self.idf,
+            "weights": self.weights,
+            "bias": self.bias,
+        }
+        atomic_json.write_json(path, model, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "CharNgramClassifier":
+        with open(path, "r", encoding="utf-8") as f:
+            model = json.load(f)
+        if model.get("version") != cls.VERSION:
+            raise ValueError(f"不支持的模型版本: {model.get('version')}")
+        clf = cls(model["ngram_range"], model["min_df"])
+        clf.labels = model["labels"]
+        clf.idf = model["idf"]
+        clf.weights = model["weights"]
+        clf.bias = model["bias"]
+        return clf
+
+
+def load_local_classifier(path: Optional[str]) -> Optional[CharNgramClassifier]:
+    """加载本地意图模型，文件不存在或损坏时返回None（全部走大模型分类）"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        clf = CharNgramClassifier.load(path)
+        logger.info(f"已加载本地意图模型: {path}，标签: {clf.labels}，特征数: {len(clf.idf)}")
+        return clf
+    except Exception as e:
+        logger.error(f"加载本地意图模型失败: {e}")
+        return None
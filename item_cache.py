@@ -0,0 +1,151 @@
+import time
+import asyncio
+from collections import OrderedDict
+from loguru import logger
+from utils.singleflight import SingleFlight
+
+
+class ItemInfoCache:
+    """
+    商品信息两级缓存
+    
+    第一级为内存LRU，第二级为SQLite的items表，均按更新时间判断新鲜度：
+    - 新鲜（未超过ttl）：直接返回
+    - 过期但未超过stale_ttl：立即返回旧数据，同时在后台刷新（stale-while-revalidate）
+    - 更旧或不存在：同步请求接口获取
+    接口获取失败的商品会被负缓存negative_ttl秒，期间不再重复请求；
+    若仍有旧数据则继续使用旧数据。同一商品的并发未命中与后台刷新共享一次接口请求。
+    """
+    
+    def __init__(self, store, fetcher, ttl=3600, stale_ttl=86400, negative_ttl=300, max_size=500):
+        """
+        初始化商品信息缓存
+        
+        Args:
+            store: 异步上下文存储，提供get_item_record/save_item_info
+            fetcher: 从接口获取商品信息的协程函数，失败时返回None
+            ttl: 商品信息新鲜期（秒）
+            stale_ttl: 允许返回旧数据并后台刷新的最长时间（秒）
+            negative_ttl: 获取失败的商品负缓存时间（秒）
+            max_size: 内存缓存的商品数量上限
+        """
+        self.store = store
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._memory = OrderedDict()  # item_id -> (item_info, fetched_at)
+        self._negative = OrderedDict()  # item_id -> 负缓存过期时间，按过期时间先后排列
+        self._flights = SingleFlight()  # 按item_id合并并发的接口请求
+        self.stats = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "fetch_failures": 0,
+            "refreshes": 0,
+        }
+        
+    async def get(self, item_id):
+        """
+        获取商品信息
+        
+        Returns:
+            dict: 商品信息，获取失败且无旧数据时返回None
+        """
+        now = time.time()
+        record = self._memory.get(item_id)
+        from_memory = record is not None
+        if record is None:
+            record = await self.store.get_item_record(item_id)
+            if record is not None:
+                self._remember(item_id, *record)
+                
+        if record is not None:
+            item_info, fetched_at = record
+            age = now - fetched_at
+            if age < self.ttl:
+                self._memory.move_to_end(item_id)
+                self.stats["memory_hits" if from_memory else "db_hits"] += 1
+                return item_info
+            if age < self.stale_ttl:
+                self._memory.move_to_end(item_id)
+                self.stats["stale_hits"] += 1
+                self._schedule_refresh(item_id)
+                return item_info
+                
+        # 负缓存期间不再请求接口，有旧数据时继续使用旧数据
+        if self._is_negative(item_id, now):
+            self.stats["negative_hits"] += 1
+            return record[0] if record else None
+            
+        self.stats["misses"] += 1
+        item_info = await self._fetch(item_id)
+        if item_info is None and record is not None:
+            logger.warning(f"商品 {item_id} 信息刷新失败，继续使用旧数据")
+            return record[0]
+        return item_info
+    
+    async def _fetch(self, item_id):
+        """从接口获取商品信息，同一商品的并发请求共享一次调用"""
+        return await self._flights.do(item_id, lambda: self._fetch_once(item_id))
+    
+    async def _fetch_once(self, item_id):
+        """从接口获取商品信息并写入两级缓存，失败时写入负缓存"""
+        try:
+            item_info = await self.fetcher(item_id)
+        except Exception as e:
+            logger.error(f"获取商品信息出错: {e}")
+            item_info = None
+            
+        if item_info is None:
+            self.stats["fetch_failures"] += 1
+            self._mark_negative(item_id)
+            return None
+            
+        self._negative.pop(item_id, None)
+        self._remember(item_id, item_info, time.time())
+        await self.store.save_item_info(item_id, item_info)
+        return item_info
+    
+    def _is_negative(self, item_id, now):
+        """检查商品是否在负缓存期内，已过期的记录顺便删除"""
+        expires_at = self._negative.get(item_id)
+        if expires_at is None:
+            return False
+        if expires_at > now:
+            return True
+        del self._negative[item_id]
+        return False
+
+    def _mark_negative(self, item_id):
+        """写入负缓存，并清理头部已过期的记录，数量不超过max_size"""
+        now = time.time()
+        self._negative.pop(item_id, None)
+        self._negative[item_id] = now + self.negative_ttl  # 过期时长相同，追加到末尾即保持按过期时间排列
+        while self._negative:
+            expires_at = next(iter(self._negative.values()))
+            if expires_at > now and len(self._negative) <= self.max_size:
+                break
+            self._negative.popitem(last=False)
+
+    def _remember(self, item_id, item_info, fetched_at):
+        """写入内存LRU并淘汰最久未使用的商品"""
+        self._memory[item_id] = (item_info, fetched_at)
+        self._memory.move_to_end(item_id)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+        
+    def _schedule_refresh(self, item_id):
+        """后台刷新商品信息，同一商品同时只有一个刷新任务"""
+        if self._flights.in_flight(item_id) or self._is_negative(item_id, time.time()):
+            return
+        self.stats["refreshes"] += 1
+        asyncio.create_task(self._fetch(item_id))
+        
+    def get_stats(self):
+        """获取缓存统计"""
+        return dict(self.stats, size=len(self._memory), negative=len(self._negative),
+                    shared_fetches=self._flights.stats["shared"])
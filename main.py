@@ -3,28 +3,250 @@ import json
 import asyncio
 import time
 import os
+from collections import OrderedDict
 import websockets
 from loguru import logger
 from dotenv import load_dotenv
-from XianyuApis import XianyuApis
+from XianyuApis import AsyncXianyuApis
 import sys
+import signal
 
 
-from utils.xianyu_utils import generate_mid, generate_uuid, trans_cookies, generate_device_id, decrypt
+from utils.xianyu_utils import generate_mid, generate_uuid, trans_cookies, generate_device_id, build_ack
+from utils import fastjson
+from utils.frame_classifier import (
+    FrameClassifier, is_system_message, is_sync_package,
+    FRAME_SYNC_EMPTY, FRAME_DUPLICATE, FRAME_DECRYPT_ERROR, FRAME_ORDER, FRAME_TYPING, FRAME_CHAT,
+)
 from XianyuAgent import XianyuReplyBot
-from context_manager import ChatContextManager
+from context_manager import AsyncChatContextManager
+from item_cache import ItemInfoCache
+from utils.singleflight import SingleFlight
+from utils.retry import RetryPolicy
+from sync_state import SyncState
+
+
+class ChatDispatcher:
+    """
+    会话级回复分发器
+
+    每个会话(chat_id)拥有独立的串行队列，保证同一会话的消息按顺序回复；
+    不同会话之间并发处理，并通过全局信号量限制同时生成回复的数量。
+    空闲超时的会话队列会被自动回收。
+    """
+
+    def __init__(self, handler, max_concurrency=4, max_queue_size=20, idle_timeout=300):
+        """
+        Args:
+            handler: 处理单个任务的协程函数
+            max_concurrency: 全局最大并发处理数
+            max_queue_size: 单个会话队列的最大长度
+            idle_timeout: 会话队列空闲多久后回收（秒）
+        """
+        self.handler = handler
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.idle_timeout = idle_timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.queues = {}   # chat_id -> asyncio.Queue
+        self.workers = {}  # chat_id -> asyncio.Task
+        self.stats = {}    # chat_id -> 等待时间等统计信息
+        self.running = 0
+        self.total_processed = 0
+        self.total_dropped = 0
+        self.total_reaped = 0
+
+    def submit(self, chat_id, job):
+        """
+        提交任务到会话队列
+
+        Returns:
+            bool: 是否成功入队，队列已满时返回False
+        """
+        queue = self.queues.get(chat_id)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self.queues[chat_id] = queue
+            self.stats.setdefault(chat_id, {"processed": 0, "total_wait": 0.0, "max_wait": 0.0})
+        try:
+            queue.put_nowait((job, time.time()))
+        except asyncio.QueueFull:
+            self.total_dropped += 1
+            return False
+
+        worker = self.workers.get(chat_id)
+        if worker is None or worker.done():
+            self.workers[chat_id] = asyncio.create_task(self._chat_worker(chat_id, queue))
+        return True
+
+    async def _chat_worker(self, chat_id, queue):
+        """会话工作协程，串行处理该会话的任务，空闲超时后退出"""
+        while True:
+            try:
+                job, enqueued_at = await asyncio.wait_for(queue.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                # 超时判断与回收之间没有await，不会与submit产生竞争
+                if queue.empty():
+                    self._reap(chat_id)
+                    return
+                continue
+
+            async with self.semaphore:
+                wait_time = time.time() - enqueued_at
+                stats = self.stats[chat_id]
+                stats["processed"] += 1
+                stats["total_wait"] += wait_time
+                stats["max_wait"] = max(stats["max_wait"], wait_time)
+                self.running += 1
+                try:
+                    await self.handler(job)
+                except Exception as e:
+                    logger.error(f"会话 {chat_id} 处理任务出错: {str(e)}")
+                finally:
+                    self.running -= 1
+                    self.total_processed += 1
+                    queue.task_done()
+
+    def _reap(self, chat_id):
+        """回收空闲会话队列"""
+        self.queues.pop(chat_id, None)
+        self.workers.pop(chat_id, None)
+        self.stats.pop(chat_id, None)
+        self.total_reaped += 1
+        logger.debug(f"会话 {chat_id} 队列空闲超时，已回收")
+
+    def get_metrics(self):
+        """获取队列深度与等待时间统计"""
+        chats = {}
+        for chat_id, queue in self.queues.items():
+            stats = self.stats.get(chat_id, {})
+            processed = stats.get("processed", 0)
+            chats[chat_id] = {
+                "depth": queue.qsize(),
+                "processed": processed,
+                "avg_wait": stats.get("total_wait", 0.0) / processed if processed else 0.0,
+                "max_wait": stats.get("max_wait", 0.0),
+            }
+        return {
+            "active_chats": len(self.queues),
+            "running": self.running,
+            "max_concurrency": self.max_concurrency,
+            "total_depth": sum(chat["depth"] for chat in chats.values()),
+            "total_processed": self.total_processed,
+            "total_dropped": self.total_dropped,
+            "total_reaped": self.total_reaped,
+            "chats": chats,
+        }
+
+    async def close(self):
+        """取消所有会话工作协程"""
+        workers = list(self.workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self.queues.clear()
+        self.workers.clear()
+        self.stats.clear()
+
+
+class BurstCoalescer:
+    """
+    连发消息合并器
+
+    买家常把一句话拆成多条消息连续发送，合并器为每个会话维护一个防抖窗口，
+    窗口内到达的消息合并为一次回复任务；收到正在输入状态时顺延窗口，
+    但从第一条消息起最长不超过max_wait秒。
+    """
+
+    def __init__(self, flush_callback, window=1.5, max_wait=6.0):
+        """
+        Args:
+            flush_callback: 窗口结束时以合并后的任务调用的函数
+            window: 防抖窗口（秒），为0时不合并
+            max_wait: 从第一条消息起最长等待时间（秒）
+        """
+        self.flush_callback = flush_callback
+        self.window = window
+        self.max_wait = max_wait
+        self.pending = {}  # chat_id -> {"jobs": [...], "first_at": float, "deadline": float, "task": Task}
+        self.total_messages = 0
+        self.total_batches = 0
+
+    def add(self, chat_id, job):
+        """加入一条待回复消息"""
+        self.total_messages += 1
+        if self.window <= 0:
+            self.total_batches += 1
+            self.flush_callback(job)
+            return
+
+        now = time.time()
+        burst = self.pending.get(chat_id)
+        if burst is None:
+            burst = {"jobs": [], "first_at": now, "deadline": now, "task": None}
+            self.pending[chat_id] = burst
+        burst["jobs"].append(job)
+        self._extend(burst, now)
+        if burst["task"] is None:
+            burst["task"] = asyncio.create_task(self._wait_and_flush(chat_id, burst))
+
+    def touch(self, peer_id):
+        """收到正在输入状态时顺延对应会话的窗口，peer_id可以是会话ID或买家ID"""
+        now = time.time()
+        for chat_id, burst in self.pending.items():
+            if chat_id == peer_id or any(job["send_user_id"] == peer_id for job in burst["jobs"]):
+                self._extend(burst, now)
+
+    def _extend(self, burst, now):
+        burst["deadline"] = min(now + self.window, burst["first_at"] + self.max_wait)
+
+    async def _wait_and_flush(self, chat_id, burst):
+        """等待窗口结束后合并并提交"""
+        while True:
+            remaining = burst["deadline"] - time.time()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(remaining)
+
+        self.pending.pop(chat_id, None)
+        jobs = burst["jobs"]
+        self.total_batches += 1
+        merged = dict(jobs[-1])
+        merged["send_message"] = "\n".join(job["send_message"] for job in jobs)
+        if len(jobs) > 1:
+            logger.info(f"会话 {chat_id} 合并 {len(jobs)} 条连发消息为一次回复")
+        self.flush_callback(merged)
+
+    def get_metrics(self):
+        """获取合并统计"""
+        return {
+            "pending_chats": len(self.pending),
+            "total_messages": self.total_messages,
+            "total_batches": self.total_batches,
+            "saved_calls": self.total_messages - self.total_batches - sum(len(b["jobs"]) for b in self.pending.values()),
+        }
 
 
 class XianyuLive:
     def __init__(self, cookies_str):
-        self.xianyu = XianyuApis()
+        # 异步API客户端，token刷新与商品查询不阻塞消息处理
+        self.xianyu = AsyncXianyuApis(timeouts={
+            'token': float(os.getenv("API_TOKEN_TIMEOUT", "10")),  # token接口超时，默认10秒
+            'item': float(os.getenv("API_ITEM_TIMEOUT", "8")),     # 商品详情接口超时，默认8秒
+        })
         self.base_url = 'wss://wss-goofish.dingtalk.com/'
         self.cookies_str = cookies_str
         self.cookies = trans_cookies(cookies_str)
         self.xianyu.session.cookies.update(self.cookies)  # 直接使用 session.cookies.update
         self.myid = self.cookies['unb']
         self.device_id = generate_device_id(self.myid)
-        self.context_manager = ChatContextManager()
+        # 数据库操作在专用线程执行，不阻塞事件循环；消息写入经写缓冲批量落盘
+        self.context_manager = AsyncChatContextManager(
+            write_batch_rows=int(os.getenv("DB_WRITE_BATCH_ROWS", "100")),              # 写缓冲满多少条立即落盘，默认100条
+            write_flush_interval=int(os.getenv("DB_WRITE_FLUSH_MS", "200")) / 1000,    # 写缓冲定时落盘间隔，默认200毫秒
+            context_cache_size=int(os.getenv("CONTEXT_CACHE_SIZE", "1000")),           # 内存缓存的会话窗口数，默认1000个
+            context_cache_ttl=int(os.getenv("CONTEXT_CACHE_TTL", "1800")),             # 会话窗口缓存过期时间，默认30分钟
+        )
         
         # 心跳相关配置
         self.heartbeat_interval = int(os.getenv("HEARTBEAT_INTERVAL", "15"))  # 心跳间隔，默认15秒
@@ -40,8 +262,34 @@ class XianyuLive:
         self.last_token_refresh_time = 0
         self.current_token = None
         self.token_refresh_task = None
+        self.token_flight = SingleFlight()  # 保证同一时间只有一个get_token请求
         self.connection_restart_flag = False  # 连接重启标志
         
+        # 连接平滑切换配置：刷新token后先用新token建立并注册新连接，再关闭旧连接
+        self.token_handover = os.getenv("TOKEN_HANDOVER", "true").lower() == "true"  # 是否启用平滑切换，默认启用
+        self.handover_drain = float(os.getenv("TOKEN_HANDOVER_DRAIN", "2"))        # 切换后旧连接保留时间，默认2秒
+        self.reader_task = None
+        self.handover_stats = {
+            "handovers": 0, "fallbacks": 0, "duplicates": 0,
+            "last_overlap": 0.0,        # 旧连接最后一帧晚于新连接第一帧的时长
+            "last_receive_gap": None,   # 旧连接最后一帧到新连接第一帧的接收中断，无法测量时为None
+            "missed_pts": 0,            # 新连接同步流中缺失的、旧连接在续传位置之后收到的pts数
+        }
+        self.frame_times = {}        # 连接 -> [首帧时间, 末帧时间]
+        self.handover_trace = None   # 切换期间各连接收到的同步包pts，连接 -> set
+        self.last_resume_pts = 0     # 最近一次ackDiff使用的续传位置
+        self.recent_sync_keys = OrderedDict()  # 最近处理过的同步包，新旧连接重叠期间去重
+        self.recent_sync_limit = 2048
+        self.frame_classifier = FrameClassifier()  # 帧分类及各类型帧数/耗时统计
+        
+        # 断线续传与重连退避配置
+        self.sync_state = SyncState(os.getenv("SYNC_STATE_PATH", "data/sync_state.json"))  # 最后确认的同步位置
+        self.reconnect_policy = RetryPolicy(
+            base_delay=float(os.getenv("RECONNECT_BASE_DELAY", "1")),   # 重连退避基准时间，默认1秒
+            max_delay=float(os.getenv("RECONNECT_MAX_DELAY", "60")),    # 重连退避上限，默认60秒
+        )
+        self.reconnect_attempts = 0
+        
         # 人工接管相关配置
         self.manual_mode_conversations = set()  # 存储处于人工接管模式的会话ID
         self.manual_mode_timeout = int(os.getenv("MANUAL_MODE_TIMEOUT", "3600"))  # 人工接管超时时间，默认1小时
@@ -53,13 +301,54 @@ class XianyuLive:
         # 人工接管关键词，从环境变量读取
         self.toggle_keywords = os.getenv("TOGGLE_KEYWORDS", "。")
 
+        # 商品信息缓存配置：内存LRU+数据库两级缓存，过期后先返回旧数据再后台刷新
+        self.item_cache = ItemInfoCache(
+            self.context_manager,
+            self.fetch_item_info,
+            ttl=int(os.getenv("ITEM_INFO_TTL", "3600")),                   # 商品信息新鲜期，默认1小时
+            stale_ttl=int(os.getenv("ITEM_INFO_STALE_TTL", "86400")),      # 允许先返回旧数据的最长时间，默认1天
+            negative_ttl=int(os.getenv("ITEM_INFO_NEGATIVE_TTL", "300")),  # 获取失败的商品负缓存时间，默认5分钟
+            max_size=int(os.getenv("ITEM_INFO_CACHE_SIZE", "500")),        # 内存缓存商品数，默认500个
+        )
+        
+        # 数据库保留与压缩任务配置
+        self.db_maintenance_interval = int(os.getenv("DB_MAINTENANCE_INTERVAL", "86400"))  # 维护任务间隔，默认1天，设为0关闭
+        self.chat_retention_days = int(os.getenv("CHAT_RETENTION_DAYS", "30"))            # 会话空闲多少天后归档，默认30天
+        self.bargain_count_ttl_days = int(os.getenv("BARGAIN_COUNT_TTL_DAYS", "30"))      # 议价计数过期天数，默认30天
+        self.item_cache_ttl_days = int(os.getenv("ITEM_CACHE_TTL_DAYS", "30"))            # 商品信息缓存清理天数，默认30天
+        self.chat_archive_dir = os.getenv("CHAT_ARCHIVE_DIR", "data/archive")             # 会话归档目录
+        self.db_full_vacuum = os.getenv("DB_FULL_VACUUM", "false").lower() == "true"       # 旧数据库维护时执行一次完整VACUUM，默认关闭
+        self.maintenance_task = None
+        
+        # 异步回复流水线配置：WebSocket读取循环只负责入队，回复由会话分发器按会话串行、跨会话并发处理
+        self.reply_workers = int(os.getenv("REPLY_WORKERS", "4"))                  # 全局最大并发回复数，默认4个
+        self.chat_queue_size = int(os.getenv("CHAT_QUEUE_SIZE", "20"))             # 单个会话待回复队列容量，默认20条
+        self.chat_queue_idle_timeout = int(os.getenv("CHAT_QUEUE_IDLE_TIMEOUT", "300"))  # 会话队列空闲回收时间，默认5分钟
+        self.dispatch_metrics_interval = int(os.getenv("DISPATCH_METRICS_INTERVAL", "300"))  # 分发统计日志间隔，默认5分钟
+        self.dispatcher = ChatDispatcher(
+            self.process_reply,
+            max_concurrency=self.reply_workers,
+            max_queue_size=self.chat_queue_size,
+            idle_timeout=self.chat_queue_idle_timeout,
+        )
+        self.dispatch_metrics_task = None
+
+        # 连发消息合并配置：窗口内的多条消息合并为一次回复，正在输入时顺延窗口
+        self.burst_window = float(os.getenv("BURST_WINDOW", "1.5"))      # 合并窗口，默认1.5秒，设为0关闭
+        self.burst_max_wait = float(os.getenv("BURST_MAX_WAIT", "6"))    # 最长等待时间，默认6秒
+        self.coalescer = BurstCoalescer(self.enqueue_reply, window=self.burst_window, max_wait=self.burst_max_wait)
+
     async def refresh_token(self):
+        """刷新token，并发调用共享同一次刷新"""
+        return await self.token_flight.do("token", self._refresh_token)
+
+    async def _refresh_token(self):
         """刷新token"""
         try:
             logger.info("开始刷新token...")
             
             # 获取新token（如果Cookie失效，get_token会直接退出程序）
-            token_result = self.xianyu.get_token(self.device_id)
+            token_result = await self.xianyu.get_token(self.device_id)
             if 'data' in token_result and 'accessToken' in token_result['data']:
                 new_token = token_result['data']['accessToken']
                 self.current_token = new_token
@@ -86,6 +375,9 @@ class XianyuLive:
                     
                     new_token = await self.refresh_token()
                     if new_token:
+                        # 优先平滑切换到新连接，失败时退回到关闭当前连接重连
+                        if self.token_handover and await self.handover():
+                            continue
                         logger.info("Token刷新成功，准备重新建立连接...")
                         # 设置连接重启标志
                         self.connection_restart_flag = True
@@ -105,6 +397,132 @@ class XianyuLive:
                 logger.error(f"Token刷新循环出错: {e}")
                 await asyncio.sleep(60)
 
+    async def connect(self):
+        """建立WebSocket连接并完成注册"""
+        headers = {
+            "Cookie": self.cookies_str,
+            "Host": "wss-goofish.dingtalk.com",
+            "Connection": "Upgrade",
+            "Pragma": "no-cache",
+            "Cache-Control": "no-cache",
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36",
+            "Origin": "https://www.goofish.com",
+            "Accept-Encoding": "gzip, deflate, br, zstd",
+            "Accept-Language": "zh-CN,zh;q=0.9",
+        }
+        websocket = await websockets.connect(self.base_url, extra_headers=headers)
+        try:
+            await self.init(websocket)
+        except BaseException:
+            await websocket.close()
+            raise
+        return websocket
+
+    def attach(self, websocket):
+        """将连接设为当前连接：启动读取与心跳任务，之后的回复都从该连接发出"""
+        self.ws = websocket
+        self.reader_task = asyncio.create_task(self.read_loop(websocket))
+        
+        # 初始化心跳时间
+        self.last_heartbeat_time = time.time()
+        self.last_heartbeat_response = time.time()
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+        self.heartbeat_task = asyncio.create_task(self.heartbeat_loop(websocket))
+
+    async def handover(self):
+        """
+        先建后断的连接切换
+        
+        用当前token建立并注册新连接，新连接开始读取后才关闭旧连接，
+        旧连接保留handover_drain秒以接收已在途的消息，重叠期间的重复推送由同步包去重过滤。
+        
+        Returns:
+            bool: 切换成功返回True，失败时旧连接保持不变
+        """
+        start = time.time()
+        old_ws, old_reader = self.ws, self.reader_task
+        self.handover_trace = {old_ws: set()}
+        try:
+            try:
+                new_ws = await self.connect()
+            except Exception as e:
+                self.handover_stats["fallbacks"] += 1
+                logger.warning(f"新连接建立失败，无法平滑切换: {e}")
+                return False
+            resume_pts = self.last_resume_pts
+            self.handover_trace[new_ws] = set()
+            
+            self.attach(new_ws)
+            new_ready = time.time()
+            await asyncio.sleep(self.handover_drain)
+            if old_ws:
+                await old_ws.close()
+            if old_reader:
+                await asyncio.gather(old_reader, return_exceptions=True)
+            old_pts, new_pts = self.handover_trace[old_ws], self.handover_trace[new_ws]
+        finally:
+            self.handover_trace = None
+        
+        # 接收中断：旧连接最后一帧到新连接第一帧，为负表示两条连接同时在收帧
+        old_frames = self.frame_times.pop(old_ws, None)
+        new_frames = self.frame_times.get(new_ws)
+        gap = overlap = None
+        if old_frames and new_frames:
+            gap = max(0.0, new_frames[0] - old_frames[1])
+            overlap = max(0.0, old_frames[1] - new_frames[0])
+        
+        # pts连续性：新连接从resume_pts续传，旧连接在此之后收到的pts都应出现在新连接的同步流中；
+        # 只检查不晚于新连接已收到的最大pts的部分，更晚的可能尚在途中
+        missed = []
+        if new_pts:
+            newest = max(new_pts)
+            missed = sorted(pts for pts in old_pts if resume_pts < pts <= newest and pts not in new_pts)
+        
+        self.handover_stats["handovers"] += 1
+        self.handover_stats["last_overlap"] = overlap or 0.0
+        self.handover_stats["last_receive_gap"] = gap
+        self.handover_stats["missed_pts"] += len(missed)
+        gap_text = f"{gap * 1000:.0f}ms" if gap is not None else "未知（切换期间无帧）"
+        logger.info(
+            f"连接平滑切换完成: 新连接就绪耗时 {new_ready - start:.2f}s, "
+            f"收帧重叠 {(overlap or 0.0) * 1000:.0f}ms, 接收中断 {gap_text}, "
+            f"旧连接同步包 {len(old_pts)} 个/新连接 {len(new_pts)} 个, "
+            f"累计去重 {self.handover_stats['duplicates']} 条"
+        )
+        if missed:
+            logger.warning(f"切换后新连接同步流缺失 {len(missed)} 个pts（已由旧连接收到）: {missed[:10]}")
+        return True
+
+    def trace_sync_pts(self, websocket, message_data):
+        """切换期间记录各连接收到的同步包pts，用于检查新连接同步流的连续性"""
+        pts_seen = self.handover_trace.get(websocket)
+        if pts_seen is None or not is_sync_package(message_data):
+            return
+        for sync_data in message_data["body"]["syncPushPackage"]["data"]:
+            if isinstance(sync_data, dict) and sync_data.get("pts"):
+                pts_seen.add(sync_data["pts"])
+
+    def accept_sync(self, sync_data):
+        """解密前检查同步包：过滤重复推送和续传补推的已处理消息，并记录同步位置"""
+        if self.is_duplicate_sync(sync_data):
+            return False
+        # 记录同步位置；pts未前进说明是续传补推的已处理消息
+        if "pts" in sync_data and not self.sync_state.update(sync_data["pts"], sync_data.get("seq")):
+            return False
+        return True
+
+    def is_duplicate_sync(self, sync_data):
+        """检查同步包是否已处理过（新旧连接可能推送同一条消息）"""
+        key = sync_data.get("data")
+        if key in self.recent_sync_keys:
+            self.handover_stats["duplicates"] += 1
+            return True
+        self.recent_sync_keys[key] = None
+        if len(self.recent_sync_keys) > self.recent_sync_limit:
+            self.recent_sync_keys.popitem(last=False)
+        return False
+
     async def send_msg(self, ws, cid, toid, text):
         text = {
             "contentType": 1,
@@ -149,7 +567,7 @@ class XianyuLive:
                 }
             ]
         }
-        await ws.send(json.dumps(msg))
+        await ws.send(fastjson.dumps(msg))
 
     async def init(self, ws):
         # 如果没有token或者token过期，获取新token
@@ -175,71 +593,20 @@ class XianyuLive:
                 "mid": generate_mid()
             }
         }
-        await ws.send(json.dumps(msg))
+        await ws.send(fastjson.dumps(msg))
         # 等待一段时间，确保连接注册完成
         await asyncio.sleep(1)
+        # 从最后确认的同步位置继续，断线期间的消息由服务端补推；位置过旧时补推的消息都会过期，从当前时间开始
+        pts, seq = self.sync_state.resume_position(self.message_expire_time / 1000)
+        self.last_resume_pts = pts
+        if pts == self.sync_state.pts:
+            logger.info(f"从上次同步位置继续: pts={pts}, seq={seq}")
         msg = {"lwp": "/r/SyncStatus/ackDiff", "headers": {"mid": "5701741704675979 0"}, "body": [
             {"pipeline": "sync", "tooLong2Tag": "PNM,1", "channel": "sync", "topic": "sync", "highPts": 0,
-             "pts": int(time.time() * 1000) * 1000, "seq": 0, "timestamp": int(time.time() * 1000)}]}
-        await ws.send(json.dumps(msg))
+             "pts": pts, "seq": seq, "timestamp": int(time.time() * 1000)}]}
+        await ws.send(fastjson.dumps(msg))
         logger.info('连接注册完成')
 
-    def is_chat_message(self, message):
-        """判断是否为用户聊天消息"""
-        try:
-            return (
-                isinstance(message, dict) 
-                and "1" in message 
-                and isinstance(message["1"], dict)  # 确保是字典类型
-                and "10" in message["1"]
-                and isinstance(message["1"]["10"], dict)  # 确保是字典类型
-                and "reminderContent" in message["1"]["10"]
-            )
-        except Exception:
-            return False
-
-    def is_sync_package(self, message_data):
-        """判断是否为同步包消息"""
-        try:
-            return (
-                isinstance(message_data, dict)
-                and "body" in message_data
-                and "syncPushPackage" in message_data["body"]
-                and "data" in message_data["body"]["syncPushPackage"]
-                and len(message_data["body"]["syncPushPackage"]["data"]) > 0
-            )
-        except Exception:
-            return False
-
-    def is_typing_status(self, message):
-        """判断是否为用户正在输入状态消息"""
-        try:
-            return (
-                isinstance(message, dict)
-                and "1" in message
-                and isinstance(message["1"], list)
-                and len(message["1"]) > 0
-                and isinstance(message["1"][0], dict)
-                and "1" in message["1"][0]
-                and isinstance(message["1"][0]["1"], str)
-                and "@goofish" in message["1"][0]["1"]
-            )
-        except Exception:
-            return False
-
-    def is_system_message(self, message):
-        """判断是否为系统消息"""
-        try:
-            return (
-                isinstance(message, dict)
-                and "3" in message
-                and isinstance(message["3"], dict)
-                and "needPush" in message["3"]
-                and message["3"]["needPush"] == "false"
-            )
-        except Exception:
-            return False
-
     def check_toggle_keywords(self, message):
         """检查消息是否包含切换关键词"""
         message_stripped = message.strip()
@@ -283,82 +650,40 @@ class XianyuLive:
     async def handle_message(self, message_data, websocket):
         """处理所有类型的消息"""
         try:
-
-            try:
-                message = message_data
-                ack = {
-                    "code": 200,
-                    "headers": {
-                        "mid": message["headers"]["mid"] if "mid" in message["headers"] else generate_mid(),
-                        "sid": message["headers"]["sid"] if "sid" in message["headers"] else '',
-                    }
-                }
-                if 'app-key' in message["headers"]:
-                    ack["headers"]["app-key"] = message["headers"]["app-key"]
-                if 'ua' in message["headers"]:
-                    ack["headers"]["ua"] = message["headers"]["ua"]
-                if 'dt' in message["headers"]:
-                    ack["headers"]["dt"] = message["headers"]["dt"]
-                await websocket.send(json.dumps(ack))
-            except Exception as e:
-                pass
-
-            # 如果不是同步包消息，直接返回
-            if not self.is_sync_package(message_data):
-                return
-
-            # 获取并解密数据
-            sync_data = message_data["body"]["syncPushPackage"]["data"][0]
+            # ACK已在read_loop中统一发送，这里只处理消息内容
+            # 先按帧头和结构分类，只有可能触发回复的同步包才会被解密
+            kind, message = self.frame_classifier.classify(message_data, accept=self.accept_sync)
             
-            # 检查是否有必要的字段
-            if "data" not in sync_data:
+            if kind == FRAME_SYNC_EMPTY:
                 logger.debug("同步包中无data字段")
                 return
-
-            # 解密数据
-            try:
-                data = sync_data["data"]
-                try:
-                    data = base64.b64decode(data).decode("utf-8")
-                    data = json.loads(data)
-                    # logger.info(f"无需解密 message: {data}")
-                    return
-                except Exception as e:
-                    # logger.info(f'加密数据: {data}')
-                    decrypted_data = decrypt(data)
-                    message = json.loads(decrypted_data)
-            except Exception as e:
-                logger.error(f"消息解密失败: {e}")
+            elif kind == FRAME_DUPLICATE:
+                logger.debug("重复或已确认过的同步包，跳过")
                 return
-
-            try:
-                # 判断是否为订单消息,需要自行编写付款后的逻辑
-                if message['3']['redReminder'] == '等待买家付款':
-                    user_id = message['1'].split('@')[0]
-                    user_url = f'https://www.goofish.com/personal?userId={user_id}'
+            elif kind == FRAME_DECRYPT_ERROR:
+                logger.error("消息解密失败")
+                return
+            elif kind == FRAME_ORDER:
+                # 订单消息,需要自行编写付款后的逻辑
+                user_id = message['1'].split('@')[0]
+                user_url = f'https://www.goofish.com/personal?userId={user_id}'
+                reminder = message['3']['redReminder']
+                if reminder == '等待买家付款':
                     logger.info(f'等待买家 {user_url} 付款')
-                    return
-                elif message['3']['redReminder'] == '交易关闭':
-                    user_id = message['1'].split('@')[0]
-                    user_url = f'https://www.goofish.com/personal?userId={user_id}'
+                elif reminder == '交易关闭':
                     logger.info(f'买家 {user_url} 交易关闭')
-                    return
-                elif message['3']['redReminder'] == '等待卖家发货':
-                    user_id = message['1'].split('@')[0]
-                    user_url = f'https://www.goofish.com/personal?userId={user_id}'
+                elif reminder == '等待卖家发货':
                     logger.info(f'交易成功 {user_url} 等待卖家发货')
-                    return
-
-            except:
-                pass
-
-            # 判断消息类型
-            if self.is_typing_status(message):
+                return
+            elif kind == FRAME_TYPING:
                 logger.debug("用户正在输入")
+                # 顺延该会话的连发合并窗口
+                self.coalescer.touch(message["1"][0]["1"].split('@')[0])
                 return
-            elif not self.is_chat_message(message):
-                logger.debug("其他非聊天消息")
-                logger.debug(f"原始消息: {message}")
+            elif kind != FRAME_CHAT:
+                if message is not None:
+                    logger.debug("其他非聊天消息")
+                    logger.debug(f"原始消息: {message}")
                 return
 
             # 处理聊天消息
@@ -395,63 +720,209 @@ class XianyuLive:
                     return
                 
                 # 记录卖家人工回复
-                self.context_manager.add_message_by_chat(chat_id, self.myid, item_id, "assistant", send_message)
+                await self.context_manager.add_message(chat_id, self.myid, item_id, "assistant", send_message)
                 logger.info(f"卖家人工回复 (会话: {chat_id}, 商品: {item_id}): {send_message}")
                 return
             
             logger.info(f"用户: {send_user_name} (ID: {send_user_id}), 商品: {item_id}, 会话: {chat_id}, 消息: {send_message}")
             # 添加用户消息到上下文
-            self.context_manager.add_message_by_chat(chat_id, send_user_id, item_id, "user", send_message)
+            await self.context_manager.add_message(chat_id, send_user_id, item_id, "user", send_message)
             
             # 如果当前会话处于人工接管模式，不进行自动回复
             if self.is_manual_mode(chat_id):
                 logger.info(f"🔴 会话 {chat_id} 处于人工接管模式，跳过自动回复")
                 return
-            if self.is_system_message(message):
+            if is_system_message(message):
                 logger.debug("系统消息，跳过处理")
                 return
-            # 从数据库中获取商品信息，如果不存在则从API获取并保存
-            item_info = self.context_manager.get_item_info(item_id)
-            if not item_info:
-                logger.info(f"从API获取商品信息: {item_id}")
-                api_result = self.xianyu.get_item_info(item_id)
-                if 'data' in api_result and 'itemDO' in api_result['data']:
-                    item_info = api_result['data']['itemDO']
-                    # 保存商品信息到数据库
-                    self.context_manager.save_item_info(item_id, item_info)
-                else:
-                    logger.warning(f"获取商品信息失败: {api_result}")
-                    return
-            else:
-                logger.info(f"从数据库获取商品信息: {item_id}")
-                
-            item_description = f"{item_info['desc']};当前商品售卖价格为:{str(item_info['soldPrice'])}"
-            
-            # 获取完整的对话上下文
-            context = self.context_manager.get_context_by_chat(chat_id)
-            # 生成回复
-            bot_reply = bot.generate_reply(
-                send_message,
-                item_description,
-                context=context
-            )
-            
-            # 检查是否为价格意图，如果是则增加议价次数
-            if bot.last_intent == "price":
-                self.context_manager.increment_bargain_count_by_chat(chat_id)
-                bargain_count = self.context_manager.get_bargain_count_by_chat(chat_id)
-                logger.info(f"用户 {send_user_name} 对商品 {item_id} 的议价次数: {bargain_count}")
-            
-            # 添加机器人回复到上下文
-            self.context_manager.add_message_by_chat(chat_id, self.myid, item_id, "assistant", bot_reply)
-            
-            logger.info(f"机器人回复: {bot_reply}")
-            await self.send_msg(websocket, chat_id, send_user_id, bot_reply)
+            # 经连发合并后交由会话分发器处理，避免大模型调用阻塞WebSocket读取循环
+            self.coalescer.add(chat_id, {
+                "chat_id": chat_id,
+                "item_id": item_id,
+                "send_user_id": send_user_id,
+                "send_user_name": send_user_name,
+                "send_message": send_message,
+            })
             
         except Exception as e:
             logger.error(f"处理消息时发生错误: {str(e)}")
             logger.debug(f"原始消息: {message_data}")
 
+    def enqueue_reply(self, job):
+        """将待回复消息放入所属会话的队列"""
+        if not self.dispatcher.submit(job["chat_id"], job):
+            logger.warning(f"会话 {job['chat_id']} 回复队列已满({self.chat_queue_size})，丢弃消息: {job['send_message']}")
+
+    async def dispatch_metrics_loop(self):
+        """定期输出回复分发统计"""
+        while True:
+            await asyncio.sleep(self.dispatch_metrics_interval)
+            metrics = self.dispatcher.get_metrics()
+            if not metrics["active_chats"] and not metrics["total_processed"]:
+                continue
+            burst = self.coalescer.get_metrics()
+            logger.info(
+                f"连发合并统计: 消息 {burst['total_messages']}, 回复批次 {burst['total_batches']}, "
+                f"节省大模型调用 {burst['saved_calls']} 次"
+            )
+            items = self.item_cache.get_stats()
+            logger.info(
+                f"商品缓存统计: 内存命中 {items['memory_hits']}, 数据库命中 {items['db_hits']}, "
+                f"旧数据命中 {items['stale_hits']}, 未命中 {items['misses']}, 负缓存命中 {items['negative_hits']}, "
+                f"后台刷新 {items['refreshes']}, 获取失败 {items['fetch_failures']}, 合并请求 {items['shared_fetches']}"
+            )
+            for endpoint, api in self.xianyu.retrier.get_stats().items():
+                logger.info(
+                    f"接口 {endpoint} 统计: 调用 {api['calls']}, 尝试 {api['attempts']}, 重试 {api['retries']}, "
+                    f"成功 {api['successes']}, 失败 {api['failures']}, 平均耗时 {api['avg_latency']:.2f}s"
+                )
+            frames = self.frame_classifier.get_stats()
+            logger.info("帧分类统计: " + ", ".join(
+                f"{kind} {stat['count']}帧/平均{stat['avg_us']:.0f}us" for kind, stat in frames.items()
+            ))
+            intents = bot.router.get_stats()
+            logger.info(
+                f"意图路由统计: 规则命中 {intents['rule']}, 缓存命中 {intents['cache']}, 本地模型命中 {intents['local']}, "
+                f"大模型分类 {intents['llm']}, 大模型占比 {intents['llm_ratio']:.1%}"
+            )
+            intent_cache = bot.intent_cache.get_stats()
+            logger.info(
+                f"意图缓存统计: 缓存 {intent_cache['size']} 条, 命中 {intents['cache']}, "
+                f"过期 {intent_cache['expired']}, 淘汰 {intent_cache['evictions']}, 命中率 {intent_cache['hit_rate']:.1%}"
+            )
+            if bot.streamer is not None:
+                stream = bot.streamer.get_stats()
+                logger.info(
+                    f"流式回复统计: 请求 {stream['streams']}, 屏蔽中止 {stream['blocked']}, "
+                    f"平均首token {stream['avg_ttfb']:.2f}s (最大 {stream['max_ttfb']:.2f}s), "
+                    f"平均首句 {stream['avg_first_sentence']:.2f}s, 平均总耗时 {stream['avg_total']:.2f}s"
+                )
+            if bot.speculative_reply:
+                spec = bot.get_speculation_stats()
+                logger.info(
+                    f"投机回复统计: 投机 {spec['speculations']}, 命中 {spec['hits']}, 未命中 {spec['misses']}, "
+                    f"命中率 {spec['hit_rate']:.1%}, 累计节省 {spec['saved_seconds']:.1f}s, 平均每次命中节省 {spec['avg_saved']:.2f}s"
+                )
+            cache = self.context_manager.get_cache_stats()
+            logger.info(
+                f"上下文缓存统计: 缓存会话 {cache['size']}, 命中 {cache['hits']}, 未命中 {cache['misses']}, "
+                f"淘汰 {cache['evictions']}, 命中率 {cache['hit_rate']:.1%}"
+            )
+            logger.info(
+                f"回复分发统计: 活跃会话 {metrics['active_chats']}, 处理中 {metrics['running']}/{metrics['max_concurrency']}, "
+                f"排队 {metrics['total_depth']}, 已处理 {metrics['total_processed']}, "
+                f"丢弃 {metrics['total_dropped']}, 已回收 {metrics['total_reaped']}"
+            )
+            for chat_id, chat in metrics["chats"].items():
+                logger.debug(
+                    f"会话 {chat_id}: 队列深度 {chat['depth']}, 已处理 {chat['processed']}, "
+                    f"平均等待 {chat['avg_wait']:.2f}s, 最大等待 {chat['max_wait']:.2f}s"
+                )
+
+    async def fetch_item_info(self, item_id):
+        """从API获取商品信息，失败时返回None"""
+        logger.info(f"从API获取商品信息: {item_id}")
+        api_result = await self.xianyu.get_item_info(item_id)
+        if 'data' in api_result and 'itemDO' in api_result['data']:
+            return api_result['data']['itemDO']
+        logger.warning(f"获取商品信息失败: {api_result}")
+        return None
+
+    async def process_reply(self, job):
+        """获取商品信息、生成回复并发送"""
+        chat_id = job["chat_id"]
+        item_id = job["item_id"]
+        send_user_id = job["send_user_id"]
+        send_user_name = job["send_user_name"]
+        send_message = job["send_message"]
+
+        # 从两级缓存获取商品信息，未命中或过期时从API获取并保存
+        item_info = await self.item_cache.get(item_id)
+        if not item_info:
+            logger.warning(f"获取商品信息失败: {item_id}")
+            return
+            
+        item_description = f"{item_info['desc']};当前商品售卖价格为:{str(item_info['soldPrice'])}"
+        
+        # 获取完整的对话上下文
+        context = await self.context_manager.get_context(chat_id)
+        # 生成回复（在线程池中执行，不阻塞事件循环）；按句发送时边生成边由sender依次发出
+        streamed = None
+        on_sentence = None
+        if bot.stream_split:
+            loop = asyncio.get_running_loop()
+            sentences = asyncio.Queue()
+            on_sentence = lambda sentence: loop.call_soon_threadsafe(sentences.put_nowait, sentence)
+            streamed = asyncio.create_task(self.send_sentences(sentences, chat_id, send_user_id))
+        try:
+            bot_reply, intent = await bot.agenerate_reply(
+                send_message,
+                item_description,
+                context=context,
+                on_sentence=on_sentence
+            )
+        finally:
+            if streamed is not None:
+                sentences.put_nowait(None)
+                streamed = await streamed
+        
+        # 检查是否为价格意图，如果是则增加议价次数
+        if intent == "price":
+            await self.context_manager.increment_bargain_count(chat_id)
+            bargain_count = await self.context_manager.get_bargain_count(chat_id)
+            logger.info(f"用户 {send_user_name} 对商品 {item_id} 的议价次数: {bargain_count}")
+        
+        # 添加机器人回复到上下文
+        await self.context_manager.add_message(chat_id, self.myid, item_id, "assistant", bot_reply)
+        
+        logger.info(f"机器人回复: {bot_reply}")
+        if streamed:
+            return
+        if not self.ws:
+            logger.warning(f"WebSocket未连接，会话 {chat_id} 的回复未发送")
+            return
+        await self.send_msg(self.ws, chat_id, send_user_id, bot_reply)
+
+    async def send_sentences(self, sentences, chat_id, send_user_id):
+        """
+        依次发送流式生成的句子，收到None时结束
+
+        Returns:
+            int: 收到的句子数，为0时回复需要整体发送（如投机命中的回复）
+        """
+        received = 0
+        while True:
+            sentence = await sentences.get()
+            if sentence is None:
+                return received
+            received += 1
+            if not self.ws:
+                logger.warning(f"WebSocket未连接，会话 {chat_id} 的回复片段未发送: {sentence}")
+                continue
+            await self.send_msg(self.ws, chat_id, send_user_id, sentence)
+
+    async def maintenance_loop(self):
+        """定期执行数据库保留与压缩任务"""
+        while True:
+            await asyncio.sleep(self.db_maintenance_interval)
+            try:
+                logger.info("开始执行数据库维护任务...")
+                report = await self.context_manager.run_maintenance(
+                    retention_days=self.chat_retention_days,
+                    bargain_ttl_days=self.bargain_count_ttl_days,
+                    item_ttl_days=self.item_cache_ttl_days,
+                    archive_dir=self.chat_archive_dir,
+                    full_vacuum=self.db_full_vacuum,
+                )
+                logger.info(
+                    f"数据库维护完成: 归档会话 {report['archived_chats']} 个/消息 {report['archived_messages']} 条, "
+                    f"清理议价计数 {report['purged_bargain_counts']} 条, 清理商品缓存 {report['purged_items']} 条, "
+                    f"数据库大小 {report['size_before'] / 1024 / 1024:.2f}MB -> {report['size_after'] / 1024 / 1024:.2f}MB, "
+                    f"回收 {report['reclaimed_pages']} 页, 耗时 {report['elapsed']:.2f}s"
+                )
+            except Exception as e:
+                logger.error(f"数据库维护任务出错: {e}")
+
     async def send_heartbeat(self, ws):
         """发送心跳包并等待响应"""
         try:
@@ -462,7 +933,7 @@ class XianyuLive:
                     "mid": heartbeat_mid
                 }
             }
-            await ws.send(json.dumps(heartbeat_msg))
+            await ws.send(fastjson.dumps(heartbeat_msg))
             self.last_heartbeat_time = time.time()
             logger.debug("心跳包已发送")
             return heartbeat_mid
@@ -470,6 +941,46 @@ class XianyuLive:
             logger.error(f"发送心跳包失败: {e}")
             raise
 
+    async def read_loop(self, websocket):
+        """读取并处理单个连接上的消息，连接关闭时返回"""
+        try:
+            async for message in websocket:
+                try:
+                    # 检查是否需要重启连接
+                    if self.connection_restart_flag:
+                        logger.info("检测到连接重启标志，准备重新建立连接...")
+                        break
+                        
+                    # 记录每条连接的首帧与末帧时间，平滑切换时计算接收中断
+                    now = time.time()
+                    self.frame_times.setdefault(websocket, [now, now])[1] = now
+                    
+                    # 每帧只解析一次，之后的处理都复用解析结果
+                    message_data = fastjson.loads(message)
+                    if self.handover_trace is not None:
+                        self.trace_sync_pts(websocket, message_data)
+                    
+                    # 处理心跳响应
+                    if await self.handle_heartbeat_response(message_data):
+                        continue
+                    
+                    # 发送通用ACK响应（每帧只ACK一次）
+                    headers = message_data.get("headers") if isinstance(message_data, dict) else None
+                    if headers and "mid" in headers:
+                        await websocket.send(build_ack(headers))
+                    
+                    # 处理其他消息
+                    await self.handle_message(message_data, websocket)
+                        
+                except json.JSONDecodeError:
+                    logger.error("消息解析失败")
+                except Exception as e:
+                    logger.error(f"处理消息时发生错误: {str(e)}")
+                    logger.debug(f"原始消息: {message}")
+        except websockets.exceptions.ConnectionClosed:
+            if websocket is self.ws:
+                logger.warning("WebSocket连接已关闭")
+
     async def heartbeat_loop(self, ws):
         """心跳维护循环"""
         while True:
@@ -508,73 +1019,30 @@ class XianyuLive:
         return False
 
     async def main(self):
+        # 分发统计任务跨重连常驻
+        if self.dispatch_metrics_task is None:
+            self.dispatch_metrics_task = asyncio.create_task(self.dispatch_metrics_loop())
+        # 数据库维护任务跨重连常驻
+        if self.maintenance_task is None and self.db_maintenance_interval > 0:
+            self.maintenance_task = asyncio.create_task(self.maintenance_loop())
         while True:
+            connected_at = None
             try:
                 # 重置连接重启标志
                 self.connection_restart_flag = False
                 
-                headers = {
-                    "Cookie": self.cookies_str,
-                    "Host": "wss-goofish.dingtalk.com",
-                    "Connection": "Upgrade",
-                    "Pragma": "no-cache",
-                    "Cache-Control": "no-cache",
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36",
-                    "Origin": "https://www.goofish.com",
-                    "Accept-Encoding": "gzip, deflate, br, zstd",
-                    "Accept-Language": "zh-CN,zh;q=0.9",
-                }
-
-                async with websockets.connect(self.base_url, extra_headers=headers) as websocket:
-                    self.ws = websocket
-                    await self.init(websocket)
-                    
-                    # 初始化心跳时间
-                    self.last_heartbeat_time = time.time()
-                    self.last_heartbeat_response = time.time()
-                    
-                    # 启动心跳任务
-                    self.heartbeat_task = asyncio.create_task(self.heartbeat_loop(websocket))
-                    
-                    # 启动token刷新任务
-                    self.token_refresh_task = asyncio.create_task(self.token_refresh_loop())
-                    
-                    async for message in websocket:
-                        try:
-                            # 检查是否需要重启连接
-                            if self.connection_restart_flag:
-                                logger.info("检测到连接重启标志，准备重新建立连接...")
-                                break
-                                
-                            message_data = json.loads(message)
-                            
-                            # 处理心跳响应
-                            if await self.handle_heartbeat_response(message_data):
-                                continue
-                            
-                            # 发送通用ACK响应
-                            if "headers" in message_data and "mid" in message_data["headers"]:
-                                ack = {
-                                    "code": 200,
-                                    "headers": {
-                                        "mid": message_data["headers"]["mid"],
-                                        "sid": message_data["headers"].get("sid", "")
-                                    }
-                                }
-                                # 复制其他可能的header字段
-                                for key in ["app-key", "ua", "dt"]:
-                                    if key in message_data["headers"]:
-                                        ack["headers"][key] = message_data["headers"][key]
-                                await websocket.send(json.dumps(ack))
-                            
-                            # 处理其他消息
-                            await self.handle_message(message_data, websocket)
-                                
-                        except json.JSONDecodeError:
-                            logger.error("消息解析失败")
-                        except Exception as e:
-                            logger.error(f"处理消息时发生错误: {str(e)}")
-                            logger.debug(f"原始消息: {message}")
+                self.attach(await self.connect())
+                connected_at = time.time()
+                
+                # 启动token刷新任务
+                self.token_refresh_task = asyncio.create_task(self.token_refresh_loop())
+                
+                # 等待当前连接结束；平滑切换后读取任务会被替换为新连接的任务，继续等待
+                while True:
+                    reader = self.reader_task
+                    await reader
+                    if self.reader_task is reader:
+                        break
 
             except websockets.exceptions.ConnectionClosed:
                 logger.warning("WebSocket连接已关闭")
@@ -583,7 +1051,14 @@ class XianyuLive:
                 logger.error(f"连接发生错误: {e}")
                 
             finally:
+                self.sync_state.save()
+                self.frame_times.clear()
+
                 # 清理任务
+                if self.ws:
+                    await self.ws.close()
+                    self.ws = None
+                    
                 if self.heartbeat_task:
                     self.heartbeat_task.cancel()
                     try:
@@ -598,12 +1073,29 @@ class XianyuLive:
                     except asyncio.CancelledError:
                         pass
                 
-                # 如果是主动重启，立即重连；否则等待5秒
+                # 如果是主动重启，立即重连；否则按指数退避（带随机抖动）等待，连接保持超过1分钟视为稳定并重置退避
                 if self.connection_restart_flag:
                     logger.info("主动重启连接，立即重连...")
                 else:
-                    logger.info("等待5秒后重连...")
-                    await asyncio.sleep(5)
+                    if connected_at and time.time() - connected_at >= 60:
+                        self.reconnect_attempts = 0
+                    delay = self.reconnect_policy.backoff(self.reconnect_attempts)
+                    self.reconnect_attempts += 1
+                    logger.info(f"等待{delay:.1f}秒后重连（第{self.reconnect_attempts}次）...")
+                    await asyncio.sleep(delay)
+
+    async def run(self):
+        """运行客服服务，退出（SIGTERM、Ctrl+C）时在事件循环内释放资源"""
+        try:
+            await self.main()
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        """保存同步位置，关闭HTTP连接池，并在数据库线程中落盘写缓冲、关闭连接后停止该线程"""
+        self.sync_state.save()
+        await self.xianyu.aclose()
+        await self.context_manager.close()
 
 
 if __name__ == '__main__':
@@ -638,5 +1130,10 @@ if __name__ == '__main__':
     cookies_str = os.getenv("COOKIES_STR")
     bot = XianyuReplyBot()
     xianyuLive = XianyuLive(cookies_str)
+    # 收到SIGTERM（如docker stop）时正常退出，保证写缓冲中的消息落盘
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     # 常驻进程
-    asyncio.run(xianyuLive.main())
+    try:
+        asyncio.run(xianyuLive.run())
+    finally:
+        bot.intent_cache.save()
@@ -0,0 +1,89 @@
+import json
+import time
+from loguru import logger
+from utils import atomic_json
+
+
+class SyncState:
+    """
+    同步位置持久化
+
+    记录最后一次确认的syncPushPackage位置（pts/seq），重连或重启后从该位置继续ackDiff，
+    断线期间到达的消息由服务端补推。位置按save_interval节流写入文件，
+    通过临时文件+os.replace原子替换，进程异常退出时最多丢失save_interval秒内的进度。
+    """
+
+    def __init__(self, path="data/sync_state.json", save_interval=1.0):
+        """
+        初始化同步位置
+
+        Args:
+            path: 状态文件路径
+            save_interval: 两次写入文件的最小间隔（秒）
+        """
+        self.path = path
+        self.save_interval = save_interval
+        self.pts = 0
+        self.seq = 0
+        self.updated_at = 0.0   # 最后一次更新位置的时间
+        self._dirty = False
+        self._last_save = 0.0
+        self._load()
+
+    def _load(self):
+        """从文件加载上次保存的位置，文件不存在或损坏时从头开始"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.pts = int(state.get("pts", 0))
+            self.seq = int(state.get("seq", 0))
+            self.updated_at = float(state.get("updated_at", 0))
+            logger.info(f"加载同步位置: pts={self.pts}, seq={self.seq}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"同步位置文件读取失败，将从当前时间开始同步: {e}")
+
+    def update(self, pts, seq=None):
+        """
+        记录已确认的同步位置，只会前进不会后退
+
+        Returns:
+            bool: 位置前进返回True，pts不大于已记录位置（重复推送）返回False
+        """
+        if not pts or pts <= self.pts:
+            return False
+        self.pts = pts
+        if seq is not None:
+            self.seq = seq
+        self.updated_at = time.time()
+        self._dirty = True
+        if self.updated_at - self._last_save >= self.save_interval:
+            self.save()
+        return True
+
+    def save(self):
+        """将未保存的位置写入文件"""
+        if not self._dirty:
+            return
+        try:
+            atomic_json.write_json(self.path, {"pts": self.pts, "seq": self.seq, "updated_at": self.updated_at})
+            self._dirty = False
+            self._last_save = time.time()
+        except Exception as e:
+            logger.error(f"保存同步位置失败: {e}")
+
+    def resume_position(self, max_age):
+        """
+        获取ackDiff使用的起始位置
+
+        Args:
+            max_age: 允许续传的最长时间（秒），更早的位置补推的消息都会过期，直接从当前时间开始
+
+        Returns:
+            tuple: (pts, seq)
+        """
+        now_pts = int(time.time() * 1000) * 1000
+        if self.pts and time.time() - self.updated_at <= max_age:
+            return self.pts, self.seq
+        return now_pts, 0
@@ -0,0 +1,99 @@
+"""
+本地意图模型训练与评估
+
+从INTENT_SAMPLE_LOG记录的大模型分类样本训练字符n-gram TF-IDF + 逻辑回归模型，
+按留出集评估与大模型分类结果的一致率，以及不同置信度阈值下可节省的大模型分类调用比例。
+
+用法:
+    python train_intent_model.py [--samples data/intent_samples.jsonl] [--output data/intent_model.json]
+                                 [--test-ratio 0.2] [--thresholds 0.6 0.7 0.8 0.85 0.9 0.95] [--no-save]
+"""
+
+import argparse
+import os
+import random
+import time
+from collections import Counter
+
+from dotenv import load_dotenv
+
+from intent_classifier import CharNgramClassifier, load_samples
+
+
+def split(samples, test_ratio, seed):
+    """按标签分层划分训练集与留出集"""
+    rng = random.Random(seed)
+    by_label = {}
+    for text, label in samples:
+        by_label.setdefault(label, []).append((text, label))
+    train, test = [], []
+    for items in by_label.values():
+        rng.shuffle(items)
+        cut = int(len(items) * test_ratio)
+        test.extend(items[:cut])
+        train.extend(items[cut:])
+    return train, test
+
+
+def evaluate(clf, test, thresholds):
+    predictions = [(clf.predict(text), label) for text, label in test]
+    correct = sum(1 for (pred, _), label in predictions if pred == label)
+    print(f"留出集 {len(test)} 条，不设阈值时与大模型一致率 {correct / len(test):.1%}")
+
+    print(f"{'阈值':>6} {'本地处理':>8} {'本地准确率':>10} {'整体一致率':>10}")
+    for threshold in thresholds:
+        covered = [(pred, label) for (pred, conf), label in predictions if pred and conf >= threshold]
+        hits = sum(1 for pred, label in covered if pred == label)
+        coverage = len(covered) / len(test)
+        local_acc = hits / len(covered) if covered else 0.0
+        # 未被本地处理的消息仍由大模型分类，视为与大模型一致
+        overall = (hits + len(test) - len(covered)) / len(test)
+        print(f"{threshold:>6.2f} {coverage:>8.1%} {local_acc:>10.1%} {overall:>10.1%}")
+
+    print("各标签（不设阈值）:")
+    for label in clf.labels:
+        total = sum(1 for _, l in predictions if l == label)
+        hits = sum(1 for (pred, _), l in predictions if l == label and pred == label)
+        if total:
+            print(f"  {label}: {hits}/{total} ({hits / total:.1%})")
+
+    start = time.perf_counter()
+    for text, _ in test:
+        clf.predict(text)
+    print(f"单条预测耗时 {(time.perf_counter() - start) / len(test) * 1e6:.0f} us")
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="本地意图模型训练与评估")
+    parser.add_argument("--samples", default=os.getenv("INTENT_SAMPLE_LOG", "data/intent_samples.jsonl"), help="样本文件")
+    parser.add_argument("--output", default=os.getenv("INTENT_MODEL_PATH", "data/intent_model.json"), help="模型输出路径")
+    parser.add_argument("--test-ratio", type=float, default=0.2, help="留出集比例")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.6, 0.7, 0.8, 0.85, 0.9, 0.95], help="评估的置信度阈值")
+    parser.add_argument("--epochs", type=int, default=15, help="训练轮数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--no-save", action="store_true", help="只评估，不保存模型")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    print(f"样本 {len(samples)} 条，标签分布: {dict(Counter(label for _, label in samples))}")
+    if len(samples) < 20:
+        print("样本过少，请先积累更多大模型分类记录")
+        return
+
+    train, test = split(samples, args.test_ratio, args.seed)
+    if test:
+        start = time.perf_counter()
+        clf = CharNgramClassifier().fit(train, epochs=args.epochs, seed=args.seed)
+        print(f"训练集 {len(train)} 条，训练耗时 {time.perf_counter() - start:.1f}s，特征数 {len(clf.idf)}")
+        evaluate(clf, test, args.thresholds)
+
+    if not args.no_save:
+        # 评估后用全部样本训练最终模型
+        clf = CharNgramClassifier().fit(samples, epochs=args.epochs, seed=args.seed)
+        clf.save(args.output)
+        print(f"模型已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick多模式匹配自动机
+
+    对所有关键词构建一次自动机，之后每段文本只需扫描一遍即可找出全部命中，
+    耗时与关键词数量无关。每个关键词可附带一个值（如所属意图）。
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, Any]] = ()):
+        """
+        Args:
+            keywords: (关键词, 附带值) 序列，空关键词会被忽略
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, Any]]] = [[]]
+        for keyword, value in keywords:
+            self._add(keyword, value)
+        self._build()
+
+    def __len__(self):
+        return sum(len(out) for out in self._output)
+
+    def _add(self, keyword: str, value: Any):
+        if not keyword:
+            return
+        state = 0
+        for char in keyword:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        self._output[state].append((keyword, value))
+
+    def _build(self):
+        """按广度优先计算失败指针，并把失败链上的输出合并到当前状态"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, str, Any]]:
+        """
+        扫描文本，按结束位置顺序产出全部命中
+
+        Yields:
+            (起始位置, 结束位置, 关键词, 附带值)，位置为左闭右开
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for pos, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                end = pos + 1
+                for keyword, value in output[state]:
+                    yield end - len(keyword), end, keyword, value
@@ -0,0 +1,18 @@
+import os
+import json
+
+
+def write_json(path: str, obj, **kwargs):
+    """
+    原子写入JSON文件
+
+    先写入同目录下的临时文件，再用os.replace替换目标文件，进程中途退出时不会留下写了一半的文件。
+    目录不存在时自动创建，kwargs透传给json.dump。
+    """
+    dir_name = os.path.dirname(path)
+    if dir_name:
+        os.makedirs(dir_name, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, **kwargs)
+    os.replace(tmp_path, path)
@@ -0,0 +1,32 @@
+"""
+JSON兼容层
+
+安装了orjson时使用orjson解析和序列化，否则退化为标准库json，调用方式与json模块一致。
+orjson.JSONDecodeError是json.JSONDecodeError的子类，原有的异常处理无需修改。
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖
+    orjson = None
+
+ORJSON_AVAILABLE = orjson is not None
+JSONDecodeError = json.JSONDecodeError
+
+
+if orjson is not None:
+    def loads(data):
+        """解析JSON文本（str或bytes）"""
+        return orjson.loads(data)
+
+    def dumps(obj) -> str:
+        """序列化为JSON文本（非ASCII字符不转义）"""
+        return orjson.dumps(obj).decode("utf-8")
+else:
+    loads = json.loads
+
+    def dumps(obj) -> str:
+        """序列化为JSON文本"""
+        return json.dumps(obj)
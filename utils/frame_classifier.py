@@ -0,0 +1,186 @@
+import time
+import base64
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils import fastjson
+from utils.xianyu_utils import decrypt_to_obj
+
+# 帧类型
+FRAME_RESPONSE = "response"          # 带code的响应帧（心跳响应、发送回执等）
+FRAME_NON_SYNC = "non_sync"          # 其他不含同步包的推送
+FRAME_SYNC_EMPTY = "sync_empty"      # 同步包中没有data字段
+FRAME_DUPLICATE = "duplicate"        # 已处理过的同步包
+FRAME_PLAIN = "plain"                # 未加密的JSON通知，不会触发回复
+FRAME_DECRYPT_ERROR = "decrypt_error"
+FRAME_ORDER = "order"                # 订单状态消息
+FRAME_TYPING = "typing"              # 正在输入
+FRAME_CHAT = "chat"                  # 聊天消息
+FRAME_SYSTEM = "system"              # 系统消息
+FRAME_OTHER = "other"                # 其他已解密消息
+
+ORDER_REMINDERS = ("等待买家付款", "交易关闭", "等待卖家发货")
+
+
+def is_sync_package(message_data) -> bool:
+    """判断是否为同步包消息"""
+    try:
+        return (
+            isinstance(message_data, dict)
+            and "body" in message_data
+            and "syncPushPackage" in message_data["body"]
+            and "data" in message_data["body"]["syncPushPackage"]
+            and len(message_data["body"]["syncPushPackage"]["data"]) > 0
+        )
+    except Exception:
+        return False
+
+
+def is_response(message_data) -> bool:
+    """判断是否为带code的响应帧"""
+    return isinstance(message_data, dict) and "code" in message_data
+
+
+def is_order_status(message) -> bool:
+    """判断是否为订单状态消息"""
+    try:
+        return message["3"]["redReminder"] in ORDER_REMINDERS
+    except Exception:
+        return False
+
+
+def is_typing_status(message) -> bool:
+    """判断是否为用户正在输入状态消息"""
+    try:
+        return (
+            isinstance(message, dict)
+            and "1" in message
+            and isinstance(message["1"], list)
+            and len(message["1"]) > 0
+            and isinstance(message["1"][0], dict)
+            and "1" in message["1"][0]
+            and isinstance(message["1"][0]["1"], str)
+            and "@goofish" in message["1"][0]["1"]
+        )
+    except Exception:
+        return False
+
+
+def is_chat_message(message) -> bool:
+    """判断是否为用户聊天消息"""
+    try:
+        return (
+            isinstance(message, dict)
+            and "1" in message
+            and isinstance(message["1"], dict)  # 确保是字典类型
+            and "10" in message["1"]
+            and isinstance(message["1"]["10"], dict)  # 确保是字典类型
+            and "reminderContent" in message["1"]["10"]
+        )
+    except Exception:
+        return False
+
+
+def is_system_message(message) -> bool:
+    """判断是否为系统消息"""
+    try:
+        return (
+            isinstance(message, dict)
+            and "3" in message
+            and isinstance(message["3"], dict)
+            and "needPush" in message["3"]
+            and message["3"]["needPush"] == "false"
+        )
+    except Exception:
+        return False
+
+
+def is_plain_payload(data: str) -> bool:
+    """
+    判断同步包data是否为未加密的JSON
+
+    JSON对象以"{"开头，base64编码后以"ey"开头；加密数据为MessagePack，首字节编码后不会是"ey"。
+    只对以"ey"开头的数据尝试解析，其余数据直接解密。
+    """
+    if not data.startswith("ey"):
+        return False
+    try:
+        fastjson.loads(base64.b64decode(data).decode("utf-8"))
+        return True
+    except Exception:
+        return False
+
+
+class FrameClassifier:
+    """
+    表驱动的帧分类器
+
+    先用帧头和body结构等廉价检查判断帧类型，只有可能触发回复的同步包才做base64解码和解密，
+    解密后的消息再按规则表依次匹配。每种类型都统计帧数和分类耗时，用于观察CPU消耗在哪类帧上。
+    """
+
+    # 帧级规则：按顺序匹配，不做任何解码
+    FRAME_RULES = (
+        (FRAME_RESPONSE, is_response),
+    )
+
+    # 解密后的消息规则：按顺序匹配，未命中为FRAME_OTHER
+    MESSAGE_RULES = (
+        (FRAME_ORDER, is_order_status),
+        (FRAME_TYPING, is_typing_status),
+        (FRAME_CHAT, is_chat_message),
+        (FRAME_SYSTEM, is_system_message),
+    )
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+
+    def classify(self, message_data, accept: Optional[Callable[[dict], bool]] = None) -> Tuple[str, Any]:
+        """
+        对一帧分类，必要时解密
+
+        Args:
+            message_data: 解析后的帧
+            accept: 解密前对同步包data项的检查，返回False时视为重复帧，不再解密
+
+        Returns:
+            tuple: (帧类型, 解密后的消息)，未解密时消息为None
+        """
+        start = time.perf_counter()
+        kind, message = self._classify(message_data, accept)
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        self.seconds[kind] = self.seconds.get(kind, 0.0) + time.perf_counter() - start
+        return kind, message
+
+    def _classify(self, message_data, accept):
+        for kind, rule in self.FRAME_RULES:
+            if rule(message_data):
+                return kind, None
+        if not is_sync_package(message_data):
+            return FRAME_NON_SYNC, None
+
+        sync_data = message_data["body"]["syncPushPackage"]["data"][0]
+        if "data" not in sync_data:
+            return FRAME_SYNC_EMPTY, None
+        if accept is not None and not accept(sync_data):
+            return FRAME_DUPLICATE, None
+
+        data = sync_data["data"]
+        if is_plain_payload(data):
+            return FRAME_PLAIN, None
+        try:
+            message = decrypt_to_obj(data)
+        except Exception:
+            return FRAME_DECRYPT_ERROR, None
+
+        for kind, rule in self.MESSAGE_RULES:
+            if rule(message):
+                return kind, message
+        return FRAME_OTHER, message
+
+    def get_stats(self):
+        """获取各类型帧数与平均分类耗时（微秒）"""
+        return {
+            kind: {"count": count, "avg_us": self.seconds[kind] / count * 1e6}
+            for kind, count in sorted(self.counts.items(), key=lambda kv: -self.seconds[kv[0]])
+        }
@@ -0,0 +1,151 @@
+import time
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 句子结束符，按句发送时在这些字符之后切分
+SENTENCE_ENDINGS = "。！？!?；;\n"
+
+
+def split_sentences(text: str, min_chars: int = 0) -> Tuple[List[str], str]:
+    """
+    从缓冲文本中切出完整的句子
+
+    Args:
+        text: 尚未发送的文本
+        min_chars: 句子的最小长度，过短的句子与后一句合并，避免连发过多短消息
+
+    Returns:
+        Tuple: (完整句子列表, 剩余未完成的文本)
+    """
+    sentences = []
+    start = 0
+    for i, char in enumerate(text):
+        if char in SENTENCE_ENDINGS:
+            sentence = text[start:i + 1].strip()
+            if len(sentence) >= min_chars:
+                sentences.append(sentence)
+                start = i + 1
+    return sentences, text[start:]
+
+
+class ReplyStreamer:
+    """
+    流式获取大模型回复
+
+    边接收token边对已收到的全部文本做安全过滤，命中屏蔽词时立即中止请求，不再消耗后续token。
+    传入on_sentence时按句回调，调用方可以在回复生成完之前先发出已完成的句子；
+    已发出的句子无法撤回，之后命中屏蔽词时以安全提醒代替剩余内容。
+    统计首token耗时、首句耗时和总耗时。
+    """
+
+    def __init__(self, min_sentence_chars: int = 8):
+        """
+        Args:
+            min_sentence_chars: 按句发送时单条消息的最小长度
+        """
+        self.min_sentence_chars = min_sentence_chars
+        self._lock = threading.Lock()
+        self.stats = {
+            "streams": 0,
+            "blocked": 0,
+            "ttfb_seconds": 0.0,
+            "first_sentence_seconds": 0.0,
+            "first_sentences": 0,
+            "total_seconds": 0.0,
+            "max_ttfb": 0.0,
+        }
+
+    @staticmethod
+    def _deltas(stream) -> Iterator[str]:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def run(self, client, request: Dict, safety_filter: Callable[[str], str],
+            on_sentence: Optional[Callable[[str], None]] = None) -> str:
+        """
+        以流式请求大模型
+
+        Args:
+            client: OpenAI客户端
+            request: chat.completions.create的参数
+            safety_filter: 安全过滤函数，返回值与输入不同即视为命中
+            on_sentence: 每完成一句时的回调
+
+        Returns:
+            str: 过滤后的完整回复；按句回调时为实际发出的全部内容
+        """
+        start = time.perf_counter()
+        stream = client.chat.completions.create(stream=True, **request)
+        try:
+            return self.consume(self._deltas(stream), safety_filter, on_sentence, start)
+        finally:
+            stream.close()
+
+    def consume(self, deltas: Iterable[str], safety_filter: Callable[[str], str],
+                on_sentence: Optional[Callable[[str], None]] = None, start: Optional[float] = None) -> str:
+        """消费文本增量，返回值同run"""
+        start = time.perf_counter() if start is None else start
+        text = ""
+        pending = ""
+        delivered = []
+        ttfb = None
+        first_sentence = None
+        blocked = None
+
+        def deliver(sentence):
+            nonlocal first_sentence
+            if first_sentence is None:
+                first_sentence = time.perf_counter() - start
+            delivered.append(sentence)
+            on_sentence(sentence)
+
+        for delta in deltas:
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+            text += delta
+            filtered = safety_filter(text)
+            if filtered != text:
+                blocked = filtered
+                break
+            if on_sentence is not None:
+                sentences, pending = split_sentences(pending + delta, self.min_sentence_chars)
+                for sentence in sentences:
+                    deliver(sentence)
+
+        if on_sentence is None:
+            reply = safety_filter(text) if blocked is None else blocked
+        else:
+            tail = blocked if blocked is not None else pending.strip()
+            if tail:
+                deliver(tail)
+            reply = "".join(delivered)
+        self._record(ttfb, first_sentence, time.perf_counter() - start, blocked is not None)
+        return reply
+
+    def _record(self, ttfb, first_sentence, total, blocked):
+        with self._lock:
+            stats = self.stats
+            stats["streams"] += 1
+            stats["blocked"] += blocked
+            stats["total_seconds"] += total
+            if ttfb is not None:
+                stats["ttfb_seconds"] += ttfb
+                stats["max_ttfb"] = max(stats["max_ttfb"], ttfb)
+            if first_sentence is not None:
+                stats["first_sentences"] += 1
+                stats["first_sentence_seconds"] += first_sentence
+
+    def get_stats(self):
+        """获取平均首token耗时、首句耗时、总耗时及屏蔽中止次数"""
+        with self._lock:
+            stats = dict(self.stats)
+        streams = stats["streams"]
+        return {
+            "streams": streams,
+            "blocked": stats["blocked"],
+            "avg_ttfb": stats["ttfb_seconds"] / streams if streams else 0.0,
+            "max_ttfb": stats["max_ttfb"],
+            "avg_first_sentence": stats["first_sentence_seconds"] / stats["first_sentences"] if stats["first_sentences"] else 0.0,
+            "avg_total": stats["total_seconds"] / streams if streams else 0.0,
+        }
@@ -0,0 +1,208 @@
+"""
+MessagePack快速解码
+
+优先使用msgpack C扩展（可选依赖），未安装时使用纯Python实现：
+最常见的fixint/fixstr/fixmap/fixarray直接判断，其余类型按首字节查分发表，
+数值用预编译的struct.Struct在原数据上按偏移解析，bin通过memoryview切片只复制一次，
+避免MessagePackDecoder逐字节读取、长if/elif链和每个数值一次struct.unpack的开销。
+
+解码结果与utils.xianyu_utils.MessagePackDecoder一致：不支持的类型（ext等）、截断数据、
+非法UTF-8字符串均视为解码失败；首个值之后的多余字节被忽略。
+"""
+
+import base64
+import struct
+from typing import Any, Callable, List, Tuple
+
+try:
+    import msgpack
+except ImportError:  # msgpack为可选依赖
+    msgpack = None
+
+BACKEND = "msgpack" if msgpack is not None else "python"
+
+_U8 = struct.Struct(">B").unpack_from
+_U16 = struct.Struct(">H").unpack_from
+_U32 = struct.Struct(">I").unpack_from
+_U64 = struct.Struct(">Q").unpack_from
+_I8 = struct.Struct(">b").unpack_from
+_I16 = struct.Struct(">h").unpack_from
+_I32 = struct.Struct(">i").unpack_from
+_I64 = struct.Struct(">q").unpack_from
+_F32 = struct.Struct(">f").unpack_from
+_F64 = struct.Struct(">d").unpack_from
+
+# 每个处理函数签名为 (data, pos, format_byte) -> (value, new_pos)，pos指向格式字节之后
+Handler = Callable[[bytes, int, int], Tuple[Any, int]]
+
+
+def _truncated():
+    raise ValueError("Unexpected end of data")
+
+
+def _read_str(data, pos, size):
+    end = pos + size
+    if end > len(data):
+        _truncated()
+    return data[pos:end].decode("utf-8"), end
+
+
+def _read_bin(data, pos, size):
+    end = pos + size
+    if end > len(data):
+        _truncated()
+    return bytes(memoryview(data)[pos:end]), end
+
+
+def _decode(data, pos):
+    """解码pos处的一个值，返回(值, 下一个值的位置)；最常见的fixint/fixstr/fixmap/fixarray不经过分发表"""
+    byte = data[pos]
+    pos += 1
+    if byte <= 0x7f:
+        return byte, pos
+    if 0xa0 <= byte <= 0xbf:
+        end = pos + (byte & 0x1f)
+        if end > len(data):
+            _truncated()
+        return data[pos:end].decode("utf-8"), end
+    if byte <= 0x8f:
+        return _read_map(data, pos, byte & 0x0f)
+    if byte <= 0x9f:
+        return _read_array(data, pos, byte & 0x0f)
+    return _DISPATCH[byte](data, pos, byte)
+
+
+def _read_array(data, pos, size):
+    # 每个元素至少占1字节，长度超出剩余数据时直接判定为截断，避免按伪造的长度预分配
+    if size > len(data) - pos:
+        _truncated()
+    result = [None] * size
+    for i in range(size):
+        result[i], pos = _decode(data, pos)
+    return result, pos
+
+
+def _read_map(data, pos, size):
+    result = {}
+    length = len(data)
+    if size * 2 > length - pos:
+        _truncated()
+    for _ in range(size):
+        # 键和值绝大多数是短字符串或小整数，直接内联解析
+        byte = data[pos]
+        if 0xa0 <= byte <= 0xbf:
+            end = pos + 1 + (byte & 0x1f)
+            if end > length:
+                _truncated()
+            key = data[pos + 1:end].decode("utf-8")
+            pos = end
+        else:
+            key, pos = _decode(data, pos)
+        byte = data[pos]
+        if 0xa0 <= byte <= 0xbf:
+            end = pos + 1 + (byte & 0x1f)
+            if end > length:
+                _truncated()
+            result[key] = data[pos + 1:end].decode("utf-8")
+            pos = end
+        elif byte <= 0x7f:
+            result[key] = byte
+            pos += 1
+        else:
+            result[key], pos = _decode(data, pos)
+    return result, pos
+
+
+def _scalar(unpack, width):
+    def handler(data, pos, _byte):
+        return unpack(data, pos)[0], pos + width
+    return handler
+
+
+def _sized(reader, unpack, width):
+    """长度前缀类型（str/bin/array/map 8/16/32）"""
+    def handler(data, pos, _byte):
+        return reader(data, pos + width, unpack(data, pos)[0])
+    return handler
+
+
+def _constant(value):
+    def handler(_data, pos, _byte):
+        return value, pos
+    return handler
+
+
+def _unsupported(_data, _pos, byte):
+    raise ValueError(f"Unknown format byte: 0x{byte:02x}")
+
+
+def _build_dispatch() -> List[Handler]:
+    table: List[Handler] = [_unsupported] * 256
+    for byte in range(0x00, 0x80):
+        table[byte] = lambda _d, pos, b: (b, pos)                    # positive fixint
+    for byte in range(0x80, 0x90):
+        table[byte] = lambda d, pos, b: _read_map(d, pos, b & 0x0f)     # fixmap
+    for byte in range(0x90, 0xa0):
+        table[byte] = lambda d, pos, b: _read_array(d, pos, b & 0x0f)   # fixarray
+    for byte in range(0xa0, 0xc0):
+        table[byte] = lambda d, pos, b: _read_str(d, pos, b & 0x1f)     # fixstr
+    for byte in range(0xe0, 0x100):
+        table[byte] = lambda _d, pos, b: (b - 256, pos)              # negative fixint
+    table[0xc0] = _constant(None)
+    table[0xc2] = _constant(False)
+    table[0xc3] = _constant(True)
+    table[0xc4] = _sized(_read_bin, _U8, 1)
+    table[0xc5] = _sized(_read_bin, _U16, 2)
+    table[0xc6] = _sized(_read_bin, _U32, 4)
+    table[0xca] = _scalar(_F32, 4)
+    table[0xcb] = _scalar(_F64, 8)
+    table[0xcc] = _scalar(_U8, 1)
+    table[0xcd] = _scalar(_U16, 2)
+    table[0xce] = _scalar(_U32, 4)
+    table[0xcf] = _scalar(_U64, 8)
+    table[0xd0] = _scalar(_I8, 1)
+    table[0xd1] = _scalar(_I16, 2)
+    table[0xd2] = _scalar(_I32, 4)
+    table[0xd3] = _scalar(_I64, 8)
+    table[0xd9] = _sized(_read_str, _U8, 1)
+    table[0xda] = _sized(_read_str, _U16, 2)
+    table[0xdb] = _sized(_read_str, _U32, 4)
+    table[0xdc] = _sized(_read_array, _U16, 2)
+    table[0xdd] = _sized(_read_array, _U32, 4)
+    table[0xde] = _sized(_read_map, _U16, 2)
+    table[0xdf] = _sized(_read_map, _U32, 4)
+    return table
+
+
+_DISPATCH = _build_dispatch()
+
+
+def unpackb_python(data: bytes) -> Any:
+    """纯Python解码第一个MessagePack值，数据不合法时抛出ValueError"""
+    try:
+        return _decode(bytes(data), 0)[0]
+    except (IndexError, struct.error):
+        _truncated()
+
+
+def _reject_ext(code, data):
+    raise ValueError(f"Unsupported ext type: {code}")
+
+
+def unpackb_c(data: bytes) -> Any:
+    """使用msgpack C扩展解码第一个MessagePack值"""
+    try:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False, ext_hook=_reject_ext)
+    except msgpack.ExtraData as e:
+        return e.unpacked
+
+
+unpackb = unpackb_c if msgpack is not None else unpackb_python
+
+
+def decode(data: bytes) -> Any:
+    """解码MessagePack数据，失败时返回原始数据的base64编码（与MessagePackDecoder.decode一致）"""
+    try:
+        return unpackb(data)
+    except Exception:
+        return base64.b64encode(data).decode("utf-8")
@@ -0,0 +1,255 @@
+import time
+import random
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from loguru import logger
+
+
+# mtop接口ret错误码分类
+RET_SUCCESS = 'success'
+RET_RETRYABLE = 'retryable'
+RET_FATAL = 'fatal'
+
+# 令牌/会话过期，刷新cookie后重试即可恢复
+RETRYABLE_RET_CODES = (
+    'FAIL_SYS_TOKEN_EXOIRED',
+    'FAIL_SYS_TOKEN_EXPIRED',
+    'FAIL_SYS_TOKEN_EMPTY',
+    'FAIL_SYS_TOKEN_ILLEGAL',
+    'FAIL_SYS_SESSION_EXPIRED',
+    'FAIL_SYS_SERVICE_UNAVAILABLE',
+    'FAIL_SYS_SERVICE_TIMEOUT',
+    'FAIL_SYS_TRAFFIC_LIMIT',
+    'FAIL_SYS_SM_ODD_REQUEST',
+)
+
+# 签名令牌(_m_h5_tk)过期，服务端随响应下发新令牌，按新cookie重新签名后重试一次是正常的协议流程
+TOKEN_REFRESH_RET_CODES = (
+    'FAIL_SYS_TOKEN_EXOIRED',
+    'FAIL_SYS_TOKEN_EXPIRED',
+    'FAIL_SYS_TOKEN_EMPTY',
+    'FAIL_SYS_TOKEN_ILLEGAL',
+)
+
+# 风控/人机验证/业务错误，重试只会加重风控，直接失败
+FATAL_RET_CODES = (
+    'FAIL_SYS_USER_VALIDATE',
+    'RGV587_ERROR',
+    'FAIL_SYS_ILLEGAL_ACCESS',
+    'FAIL_SYS_API_NOT_FOUNDED',
+    'FAIL_SYS_PARAM',
+    'FAIL_BIZ',
+)
+
+
+def classify_ret(ret_value: Iterable[str]) -> Tuple[str, str]:
+    """
+    对mtop接口返回的ret列表进行分类
+
+    Returns:
+        Tuple[str, str]: (RET_SUCCESS/RET_RETRYABLE/RET_FATAL, 错误码)
+    """
+    ret_list = list(ret_value or [])
+    if any('SUCCESS::调用成功' in ret for ret in ret_list):
+        return RET_SUCCESS, 'SUCCESS'
+    code = ret_list[0].split('::')[0] if ret_list else 'EMPTY_RET'
+    if code.startswith(FATAL_RET_CODES):
+        return RET_FATAL, code
+    # 明确可重试的错误码与未知错误码都按可重试处理，保持原有的重试行为
+    return RET_RETRYABLE, code
+
+
+class RetryableError(Exception):
+    """可重试的错误"""
+
+
+class TokenRefreshedError(RetryableError):
+    """签名令牌过期且响应中带有新cookie，重试不消耗重试预算"""
+
+
+class FatalError(Exception):
+    """不可重试的错误"""
+
+
+class RetryError(Exception):
+    """重试次数、时间预算耗尽或遇到不可重试错误"""
+
+    def __init__(self, endpoint: str, attempts: int, last_error: Exception):
+        self.endpoint = endpoint
+        self.attempts = attempts
+        self.last_error = last_error
+        super().__init__(f"{endpoint} 在 {attempts} 次尝试后失败: {last_error}")
+
+
+class RetryPolicy:
+    """重试策略：最大尝试次数、指数退避（full jitter）与单次调用的时间预算"""
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0, deadline=30.0):
+        """
+        Args:
+            max_attempts: 最大尝试次数（含首次）
+            base_delay: 退避基准时间（秒）
+            max_delay: 单次退避上限（秒）
+            deadline: 单次调用（含所有重试）的总时间预算（秒）
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt: int) -> float:
+        """第attempt次失败后的等待时间，在[0, min(max_delay, base_delay*2^attempt)]内随机，避免多个调用同步重试"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class RetryBudget:
+    """
+    重试预算（令牌桶），每个接口一个
+
+    每次重试消耗1个令牌，每次成功返还ratio个令牌，
+    接口持续失败时令牌耗尽，后续调用不再重试，避免放大故障。
+    """
+
+    def __init__(self, ratio=0.2, max_tokens=10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def on_success(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class Retrier:
+    """
+    mtop接口共享的重试引擎
+
+    同步与异步接口共用同一套策略与统计，重试预算按接口分开，一个接口持续失败不会耗尽其他接口的重试机会。
+    attempt函数执行一次请求，抛出FatalError时立即失败，抛出其他异常时按策略退避重试；
+    抛出TokenRefreshedError时的重试不消耗预算。
+    """
+
+    def __init__(self, policies: Dict[str, RetryPolicy] = None, budget_ratio=0.2, budget_tokens=10.0):
+        """
+        Args:
+            policies: 各接口的重试策略，未配置的接口使用默认策略
+            budget_ratio: 每次成功返还的预算令牌数
+            budget_tokens: 每个接口的预算令牌上限
+        """
+        self.policies = policies or {}
+        self.default_policy = RetryPolicy()
+        self.budget_ratio = budget_ratio
+        self.budget_tokens = budget_tokens
+        self.budgets: Dict[str, RetryBudget] = {}
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _budget(self, endpoint: str) -> RetryBudget:
+        with self._lock:
+            budget = self.budgets.get(endpoint)
+            if budget is None:
+                budget = self.budgets[endpoint] = RetryBudget(self.budget_ratio, self.budget_tokens)
+            return budget
+
+    def _record(self, endpoint: str, **deltas):
+        with self._lock:
+            stats = self.stats.setdefault(endpoint, {
+                'calls': 0, 'attempts': 0, 'retries': 0, 'successes': 0,
+                'failures': 0, 'fatal': 0, 'budget_exhausted': 0, 'total_latency': 0.0,
+            })
+            for key, value in deltas.items():
+                stats[key] += value
+
+    def _next_delay(self, endpoint: str, policy: RetryPolicy, attempt: int, started: float, error: Exception):
+        """
+        判断是否继续重试
+
+        Returns:
+            float: 需要等待的秒数，返回None表示不再重试
+        """
+        if isinstance(error, FatalError):
+            self._record(endpoint, fatal=1)
+            return None
+        if attempt >= policy.max_attempts:
+            return None
+        delay = policy.backoff(attempt)
+        if time.monotonic() - started + delay > policy.deadline:
+            return None
+        if not isinstance(error, TokenRefreshedError) and not self._budget(endpoint).try_acquire():
+            self._record(endpoint, budget_exhausted=1)
+            logger.warning(f"{endpoint} 重试预算已耗尽，放弃重试")
+            return None
+        self._record(endpoint, retries=1)
+        return delay
+
+    def call(self, endpoint: str, attempt_fn: Callable[[], Any]) -> Any:
+        """同步执行attempt_fn，失败时按策略重试，最终失败抛出RetryError"""
+        policy = self.policies.get(endpoint, self.default_policy)
+        started = time.monotonic()
+        self._record(endpoint, calls=1)
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                self._record(endpoint, attempts=1)
+                try:
+                    result = attempt_fn()
+                except Exception as e:
+                    delay = self._next_delay(endpoint, policy, attempt, started, e)
+                    if delay is None:
+                        self._record(endpoint, failures=1)
+                        raise RetryError(endpoint, attempt, e) from e
+                    logger.debug(f"{endpoint} 第{attempt}次尝试失败({e})，{delay:.2f}秒后重试")
+                    time.sleep(delay)
+                    continue
+                self._budget(endpoint).on_success()
+                self._record(endpoint, successes=1)
+                return result
+        finally:
+            self._record(endpoint, total_latency=time.monotonic() - started)
+
+    async def acall(self, endpoint: str, attempt_fn: Callable[[], Any]) -> Any:
+        """异步执行attempt_fn（协程函数），失败时按策略重试，最终失败抛出RetryError"""
+        policy = self.policies.get(endpoint, self.default_policy)
+        started = time.monotonic()
+        self._record(endpoint, calls=1)
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                self._record(endpoint, attempts=1)
+                try:
+                    result = await attempt_fn()
+                except Exception as e:
+                    delay = self._next_delay(endpoint, policy, attempt, started, e)
+                    if delay is None:
+                        self._record(endpoint, failures=1)
+                        raise RetryError(endpoint, attempt, e) from e
+                    logger.debug(f"{endpoint} 第{attempt}次尝试失败({e})，{delay:.2f}秒后重试")
+                    await asyncio.sleep(delay)
+                    continue
+                self._budget(endpoint).on_success()
+                self._record(endpoint, successes=1)
+                return result
+        finally:
+            self._record(endpoint, total_latency=time.monotonic() - started)
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """获取各接口的尝试次数、成功/失败次数与平均耗时"""
+        with self._lock:
+            result = {}
+            for endpoint, stats in self.stats.items():
+                stats = dict(stats)
+                stats['avg_latency'] = stats['total_latency'] / stats['calls'] if stats['calls'] else 0.0
+                result[endpoint] = stats
+            return result
@@ -0,0 +1,39 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    并发请求合并（single-flight）
+
+    同一个key同时只执行一次fn，执行期间到达的其他调用共享同一个结果或异常。
+    共享任务通过asyncio.shield保护，单个调用方被取消不会取消正在进行的请求。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.stats = {"calls": 0, "executions": 0, "shared": 0}
+
+    def in_flight(self, key: Hashable) -> bool:
+        """key对应的请求是否正在进行"""
+        return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """执行或加入key对应的请求，返回其结果"""
+        self.stats["calls"] += 1
+        task = self._calls.get(key)
+        if task is None:
+            self.stats["executions"] += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.stats["shared"] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 所有调用方都已取消时避免"exception was never retrieved"警告
+        if not task.cancelled():
+            task.exception()
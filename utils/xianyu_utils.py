@@ -1,10 +1,14 @@
+import re
 import json
 import time
 import hashlib
 import base64
 import struct
+from json.encoder import encode_basestring_ascii
 from typing import Any, Dict, List
 
+from utils import msgpack_decoder
+
 
 def trans_cookies(cookies_str: str) -> Dict[str, str]:
     """解析cookie字符串为字典"""
@@ -27,6 +31,33 @@ def generate_mid() -> str:
     return f"{random_part}{timestamp} 0"
 
 
+ACK_EXTRA_HEADERS = ("app-key", "ua", "dt")
+
+
+def build_ack(headers: Dict[str, Any]) -> str:
+    """
+    生成消息ACK的JSON文本
+
+    ACK结构固定，只有header取值不同，直接按模板拼接字符串，不构造中间字典再整体序列化，
+    输出与json.dumps({"code": 200, "headers": {...}})等价。
+    """
+    parts = ['{"code": 200, "headers": {"mid": ', _json_str(headers["mid"]),
+             ', "sid": ', _json_str(headers.get("sid", ""))]
+    for key in ACK_EXTRA_HEADERS:
+        if key in headers:
+            parts.append(f', "{key}": ')
+            parts.append(_json_str(headers[key]))
+    parts.append('}}')
+    return ''.join(parts)
+
+
+def _json_str(value: Any) -> str:
+    """序列化单个header值"""
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    return json.dumps(value)
+
+
 def generate_uuid() -> str:
     """生成uuid"""
     timestamp = int(time.time() * 1000)
@@ -70,7 +101,7 @@ def generate_sign(t: str, token: str, data: str) -> str:
 
 
 class MessagePackDecoder:
-    """MessagePack解码器的纯Python实现"""
+    """MessagePack解码器的纯Python实现（参考实现，decrypt使用utils.msgpack_decoder）"""
     
     def __init__(self, data: bytes):
         self.data = data
@@ -284,52 +315,120 @@ class MessagePackDecoder:
             return base64.b64encode(self.data).decode('utf-8')
 
 
-def decrypt(data: str) -> str:
-    """解密函数的Python实现"""
+_JSON_SCALARS = (str, int, float, type(None))
+
+
+def _json_key(key: Any) -> str:
+    """按json.dumps的规则把映射键转为字符串"""
+    if isinstance(key, str):
+        return key
+    if key is True:
+        return "true"
+    if key is False:
+        return "false"
+    if key is None:
+        return "null"
+    if isinstance(key, int):
+        return int.__repr__(key)
+    if isinstance(key, float):
+        if key != key:
+            return "NaN"
+        if key in (float("inf"), float("-inf")):
+            return "Infinity" if key > 0 else "-Infinity"
+        return float.__repr__(key)
+    raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+
+def _json_value(obj: Any) -> Any:
+    """与原json_serializer一致：bytes优先按UTF-8解码，否则转base64"""
+    if isinstance(obj, bytes):
+        try:
+            return obj.decode('utf-8')
+        except UnicodeDecodeError:
+            return base64.b64encode(obj).decode('utf-8')
+    if hasattr(obj, '__dict__'):
+        return _normalize(obj.__dict__)
+    return str(obj)
+
+
+def _normalize(obj: Any) -> Any:
+    """
+    将解码结果规整为JSON往返后的形态（键转字符串、bytes转文本）
+
+    原地修改，只有遇到非字符串键或bytes等非JSON类型时才替换对应元素，
+    普通消息只做一次遍历，不产生新的容器。
+    """
+    if isinstance(obj, dict):
+        if not all(type(key) is str for key in obj):
+            obj = {_json_key(key): value for key, value in obj.items()}
+        for key, value in obj.items():
+            if not isinstance(value, _JSON_SCALARS):
+                obj[key] = _normalize(value)
+        return obj
+    if isinstance(obj, list):
+        for i, value in enumerate(obj):
+            if not isinstance(value, _JSON_SCALARS):
+                obj[i] = _normalize(value)
+        return obj
+    if isinstance(obj, tuple):
+        return _normalize(list(obj))
+    if isinstance(obj, _JSON_SCALARS):
+        return obj
+    return _json_value(obj)
+
+
+_BASE64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+_BASE64_URLSAFE = bytes.maketrans(b"-_", b"+/")
+_BASE64_DELETE = bytes(b for b in range(256) if b not in _BASE64_ALPHABET and b not in b"-_")
+_BASE64_INVALID = re.compile(r"[^A-Za-z0-9+/=\-_]+")
+
+
+def clean_base64(data: str) -> bytes:
+    """
+    规整base64字符串：URL安全字符转为标准字符，去掉其他非base64字符并补齐padding
+
+    ASCII输入用bytes.translate一次完成删除和替换；含非ASCII字符时先用正则去掉。
+    返回ASCII字节串，可直接交给base64.b64decode。
+    """
+    try:
+        raw = data.encode("ascii")
+    except UnicodeEncodeError:
+        raw = _BASE64_INVALID.sub("", data).encode("ascii")
+    cleaned = raw.translate(_BASE64_URLSAFE, _BASE64_DELETE)
+    return cleaned + b"=" * (-len(cleaned) % 4)
+
+
+def decrypt_to_obj(data: str) -> Any:
+    """
+    解密同步包数据并直接返回解码后的对象
+
+    结果与json.loads(decrypt(data))一致，但不经过JSON序列化和再解析。
+    """
     try:
         # 1. Base64解码
-        # 清理非base64字符
-        cleaned_data = ''.join(c for c in data if c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=')
-        
-        # 添加padding如果需要
-        while len(cleaned_data) % 4 != 0:
-            cleaned_data += '='
+        cleaned_data = clean_base64(data)
         
         try:
             decoded_bytes = base64.b64decode(cleaned_data)
         except Exception as e:
             # 如果base64解码失败，尝试其他方法
-            return json.dumps({"error": f"Base64 decode failed: {str(e)}", "raw_data": data})
+            return {"error": f"Base64 decode failed: {str(e)}", "raw_data": data}
         
-        # 2. 尝试MessagePack解码
+        # 2. 尝试MessagePack解码，并规整为JSON兼容的结构
         try:
-            decoder = MessagePackDecoder(decoded_bytes)
-            result = decoder.decode()
-            
-            # 3. 转换为JSON字符串
-            def json_serializer(obj):
-                """自定义JSON序列化器"""
-                if isinstance(obj, bytes):
-                    try:
-                        return obj.decode('utf-8')
-                    except:
-                        return base64.b64encode(obj).decode('utf-8')
-                elif hasattr(obj, '__dict__'):
-                    return obj.__dict__
-                else:
-                    return str(obj)
-            
-            return json.dumps(result, ensure_ascii=False, default=json_serializer)
-            
+            return _normalize(msgpack_decoder.decode(decoded_bytes))
         except Exception as e:
             # 如果MessagePack解码失败，尝试直接解析为字符串
             try:
-                text_result = decoded_bytes.decode('utf-8')
-                return json.dumps({"text": text_result})
+                return {"text": decoded_bytes.decode('utf-8')}
             except:
                 # 最后的备选方案：返回十六进制表示
-                hex_result = decoded_bytes.hex()
-                return json.dumps({"hex": hex_result, "error": f"Decode failed: {str(e)}"})
+                return {"hex": decoded_bytes.hex(), "error": f"Decode failed: {str(e)}"}
                 
     except Exception as e:
-        return json.dumps({"error": f"Decrypt failed: {str(e)}", "raw_data": data})
+        return {"error": f"Decrypt failed: {str(e)}", "raw_data": data}
+
+
+def decrypt(data: str) -> str:
+    """解密函数的Python实现，返回JSON字符串"""
+    return json.dumps(decrypt_to_obj(data), ensure_ascii=False)